@@ -0,0 +1,5 @@
+"""
+Бенчмарки API. Запускаются из каталога с manage.py:
+
+    python -m benchmarks.<имя модуля> --help
+"""
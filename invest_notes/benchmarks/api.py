@@ -0,0 +1,160 @@
+"""
+Латентность (p50/p99) и число SQL-запросов для эндпоинтов API
+на синтетическом наборе данных.
+
+Бенчмарк создаёт тестовую БД (как manage.py test), наполняет её
+пользователями с --labels метками и --notes заметками, прогоняет
+каждый эндпоинт --iterations раз через тестовый клиент и пишет
+результат в JSON. С --baseline сравнивает результат с сохранённым
+и завершается с кодом 1, если p99 вырос больше чем на --threshold
+процентов или стало больше запросов к БД.
+
+    python -m benchmarks.api --labels 10000 --notes 1000000 --keepdb \\
+        --output bench.json
+    python -m benchmarks.api --keepdb --baseline bench.json
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.common import measure, seed_dataset, setup_django, summarize
+
+PASSWORD = 'bench-password-123'
+
+
+def get_endpoints(user):
+    """Имя -> (метод, url, данные, нужна ли авторизация)."""
+    from django.urls import reverse
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    label = user.labels.order_by('id').first()
+    note = user.notes.order_by('-created_at', '-id').first()
+    refresh = str(RefreshToken.for_user(user))
+    credentials = {'username': user.username, 'password': PASSWORD}
+    return {
+        'labels-list': ('get', reverse('labels-list'), None, True),
+        'labels-list-deep': (
+            'get', reverse('labels-list'), {'page_size': 1000}, True),
+        'labels-by-usage': (
+            'get', reverse('labels-list'), {'ordering': '-note_count'}, True),
+        'labels-search': (
+            'get', reverse('labels-list'), {'search': 'label 99'}, True),
+        'labels-detail': (
+            'get', reverse('labels-detail', args=[label.pk]), None, True),
+        'notes-list': ('get', reverse('notes-list'), None, True),
+        'notes-detail': (
+            'get', reverse('notes-detail', args=[note.pk]), None, True),
+        'user-list': ('get', reverse('user-list'), None, True),
+        'user-me': ('get', reverse('user-me'), None, True),
+        'jwt-create': ('post', reverse('jwt-create'), credentials, False),
+        'jwt-refresh': (
+            'post', reverse('jwt-refresh'), {'refresh': refresh}, False),
+        'jwt-verify': (
+            'post', reverse('jwt-verify'), {'token': refresh}, False),
+    }
+
+
+def run(args):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+    from notes.models import User
+
+    user = User.objects.filter(username='bench-0').first()
+    if user is None:
+        user = seed_dataset(args.users, args.labels, args.notes,
+                            args.labels_per_note, PASSWORD)[0]
+
+    authorized = APIClient()
+    authorized.credentials(
+        HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(user)}')
+    anonymous = APIClient()
+
+    results = {}
+    for name, (method, url, data, auth) in get_endpoints(user).items():
+        if args.endpoints and name not in args.endpoints:
+            continue
+        client = authorized if auth else anonymous
+
+        def request():
+            response = getattr(client, method)(url, data, format=(
+                'json' if method == 'post' else None))
+            assert response.status_code < 400, (name, response.status_code)
+            return response
+
+        timings = measure(request, args.iterations)
+        with CaptureQueriesContext(connection) as queries:
+            request()
+        results[name] = {**summarize(timings), 'queries': len(queries)}
+        print(f'{name:<18} p50 {results[name]["p50_ms"]:>9} ms  '
+              f'p99 {results[name]["p99_ms"]:>9} ms  '
+              f'queries {results[name]["queries"]}', file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Список регрессий относительно baseline."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            regressions.append(f'{name}: queries {before["queries"]} -> '
+                               f'{result["queries"]}')
+        limit = before['p99_ms'] * (1 + threshold / 100)
+        if result['p99_ms'] > limit:
+            regressions.append(f'{name}: p99 {before["p99_ms"]} ms -> '
+                               f'{result["p99_ms"]} ms')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--labels', type=int, default=10000,
+                        help='меток у каждого пользователя')
+    parser.add_argument('--notes', type=int, default=1000000,
+                        help='заметок всего')
+    parser.add_argument('--labels-per-note', type=int, default=3)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--endpoints', nargs='*')
+    parser.add_argument('--keepdb', action='store_true',
+                        help='не удалять тестовую БД с данными')
+    parser.add_argument('--output', help='файл для JSON с результатами')
+    parser.add_argument('--baseline', help='JSON с прошлыми результатами')
+    parser.add_argument('--threshold', type=float, default=20,
+                        help='допустимый рост p99, в процентах')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test.utils import (setup_databases, setup_test_environment,
+                                   teardown_databases)
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False,
+                                 keepdb=args.keepdb)
+    try:
+        results = run(args)
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=args.keepdb)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import os
+import statistics
+import time
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'invest_notes.settings')
+    import django
+    django.setup()
+
+
+def summarize(timings):
+    """p50/p99 и среднее в миллисекундах по списку длительностей в секундах."""
+    timings = sorted(timings)
+    if len(timings) > 1:
+        p99 = statistics.quantiles(timings, n=100, method='inclusive')[98]
+    else:
+        p99 = timings[0]
+    return {
+        'p50_ms': round(statistics.median(timings) * 1000, 3),
+        'p99_ms': round(p99 * 1000, 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+    }
+
+
+def measure(func, iterations, warmup=3):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def seed_dataset(users, labels, notes, labels_per_note, password):
+    """
+    Наполняет БД синтетическими данными одним INSERT ... SELECT на
+    таблицу: users пользователей bench-N, у каждого labels меток и
+    notes / users заметок, у каждой заметки labels_per_note меток.
+    Note.label_ids и Label.note_count заполняются сразу, триггеры
+    их синхронизации на время вставки выключены. Возвращает список
+    созданных пользователей.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection, transaction
+    from notes.models import User
+
+    notes_per_user = notes // users
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE notes_label DISABLE TRIGGER USER')
+        cursor.execute('ALTER TABLE notes_note DISABLE TRIGGER USER')
+        cursor.execute('ALTER TABLE notes_note_labels DISABLE TRIGGER USER')
+        for index in range(users):
+            user = User.objects.create_user(
+                username=f'bench-{index}', email=f'bench-{index}@bench.local',
+                password=None)
+            user.password = make_password(password)
+            user.save(update_fields=['password'])
+            created.append(user)
+            params = {'user': user.pk, 'labels': labels,
+                      'notes': notes_per_user, 'per_note': labels_per_note}
+            cursor.execute("""
+                INSERT INTO notes_label (owner_id, title, created_at)
+                SELECT %(user)s, 'label ' || g, now()
+                FROM generate_series(1, %(labels)s) g
+            """, params)
+            cursor.execute("""
+                INSERT INTO notes_note (author_id, text, created_at,
+                                        label_ids)
+                SELECT %(user)s, 'Заметка по тикеру ' || g || ' SBER GAZP',
+                       now() - g * interval '1 second',
+                       ARRAY(SELECT DISTINCT
+                                 l.ids[1 + (g * 7 + k * 13) %% %(labels)s]
+                             FROM generate_series(0, %(per_note)s - 1) k
+                             ORDER BY 1)
+                FROM generate_series(1, %(notes)s) g, (
+                    SELECT array_agg(id ORDER BY id) AS ids
+                    FROM notes_label WHERE owner_id = %(user)s
+                ) l
+            """, params)
+            cursor.execute("""
+                INSERT INTO notes_note_labels (note_id, label_id)
+                SELECT id, unnest(label_ids) FROM notes_note
+                WHERE author_id = %(user)s
+            """, params)
+            cursor.execute("""
+                UPDATE notes_label SET note_count = counts.count
+                FROM (SELECT label_id, count(*) AS count
+                      FROM notes_note_labels nl
+                      JOIN notes_label l ON l.id = nl.label_id
+                      WHERE l.owner_id = %(user)s
+                      GROUP BY label_id) AS counts
+                WHERE notes_label.id = counts.label_id
+            """, params)
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute('ALTER TABLE notes_label ENABLE TRIGGER USER')
+        cursor.execute('ALTER TABLE notes_note ENABLE TRIGGER USER')
+        cursor.execute('ALTER TABLE notes_note_labels ENABLE TRIGGER USER')
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return created
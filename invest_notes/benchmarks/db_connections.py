@@ -0,0 +1,109 @@
+"""
+Запросов в секунду к GET /api/labels/ при разных настройках соединений
+с PostgreSQL: новое соединение на запрос, постоянные соединения
+(CONN_MAX_AGE) и пул psycopg (DB_POOL).
+
+Каждый режим запускается в отдельном процессе, запросы проходят через
+WSGIHandler, поэтому соединения закрываются и переиспользуются так же,
+как под gunicorn. Нужна локальная БД из переменных окружения DB_*;
+бенчмарк создаёт временного пользователя и удаляет его в конце.
+
+    python -m benchmarks.db_connections --requests 1000
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+MODES = {
+    'no-reuse': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '600'},
+    'pool': {'DB_POOL': 'true'},
+}
+
+
+def run_mode(requests, labels):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'invest_notes.settings')
+    import django
+    django.setup()
+
+    from django.core.handlers.wsgi import WSGIHandler
+    from rest_framework_simplejwt.tokens import AccessToken
+    from notes.models import Label, User
+
+    name = f'bench-{uuid.uuid4().hex[:12]}'
+    user = User.objects.create_user(username=name, email=f'{name}@bench.local',
+                                    password=name)
+    Label.objects.bulk_create(Label(owner=user, title=f'label {i}')
+                              for i in range(labels))
+    token = str(AccessToken.for_user(user))
+    handler = WSGIHandler()
+
+    def environ():
+        return {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': '/api/labels/',
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'HTTP_HOST': 'localhost',
+            'HTTP_AUTHORIZATION': f'JWT {token}',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.url_scheme': 'http',
+        }
+
+    def start_response(status, headers, exc_info=None):
+        assert status.startswith('200'), status
+
+    try:
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = handler(environ(), start_response)
+            b''.join(response)
+            response.close()
+        elapsed = time.perf_counter() - started
+    finally:
+        user.delete()
+    return {'requests': requests, 'seconds': round(elapsed, 3),
+            'rps': round(requests / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--labels', type=int, default=20)
+    parser.add_argument('--modes', nargs='+', choices=MODES,
+                        default=list(MODES))
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результат в JSON')
+    parser.add_argument('--run-mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        print(json.dumps(run_mode(args.requests, args.labels)))
+        return
+
+    results = {}
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.db_connections',
+             '--run-mode', mode, '--requests', str(args.requests),
+             '--labels', str(args.labels)],
+            env={**os.environ, **MODES[mode]},
+            check=True, stdout=subprocess.PIPE, text=True).stdout
+        results[mode] = json.loads(output.splitlines()[-1])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for mode, result in results.items():
+        print(f'{mode:<12} {result["rps"]:>10} req/s '
+              f'({result["requests"]} запросов за {result["seconds"]} с)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Рендеринг и разбор JSON: JSONRenderer/JSONParser DRF против
+FastJSONRenderer/FastJSONParser на больших списках меток и заметок.
+
+Данные строятся в памяти в том виде, в каком их отдают списки
+LabelViewSet и NoteViewSet (страница с next/previous/results),
+поэтому БД не нужна.
+
+    python -m benchmarks.renderers --labels 10000 --notes 1000
+"""
+import argparse
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import measure, setup_django, summarize
+
+
+def make_labels(count):
+    return [{'id': index, 'title': f'Метка {index} дивиденды'}
+            for index in range(1, count + 1)]
+
+
+def make_notes(count, labels_per_note):
+    from notes.serializers import format_datetime
+
+    started = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [{
+        'id': index,
+        'text': f'Заметка {index}: купить облигации ОФЗ, ' * 8,
+        'created_at': format_datetime(started + timedelta(minutes=index)),
+        'labels': [{'id': label, 'title': f'Метка {label}'}
+                   for label in range(index, index + labels_per_note)],
+    } for index in range(1, count + 1)]
+
+
+def page(results):
+    return {'next': 'http://testserver/api/notes/?cursor=cD0yMDI1',
+            'previous': None, 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--labels', type=int, default=10000)
+    parser.add_argument('--notes', type=int, default=1000)
+    parser.add_argument('--labels-per-note', type=int, default=3)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--output', help='файл для JSON с результатами')
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from notes.parsers import FastJSONParser
+    from notes.renderers import FastJSONRenderer, orjson
+
+    if orjson is None:
+        print('orjson не установлен: FastJSONRenderer = JSONRenderer')
+
+    datasets = {
+        'labels': page(make_labels(args.labels)),
+        'notes': page(make_notes(args.notes, args.labels_per_note)),
+    }
+    codecs = {
+        'stdlib': (JSONRenderer(), JSONParser()),
+        'fast': (FastJSONRenderer(), FastJSONParser()),
+    }
+    results = {}
+    for dataset, data in datasets.items():
+        for name, (renderer, parser) in codecs.items():
+            content = renderer.render(data, 'application/json')
+            render = summarize(measure(
+                lambda: renderer.render(data, 'application/json'),
+                args.iterations))
+            parse = summarize(measure(
+                lambda: parser.parse(io.BytesIO(content)), args.iterations))
+            key = f'{dataset}-{name}'
+            results[key] = {'bytes': len(content), 'render': render,
+                            'parse': parse}
+            print(f"{key:16} {len(content):>10} B  "
+                  f"render p50 {render['p50_ms']:>8} ms  "
+                  f"p99 {render['p99_ms']:>8} ms  "
+                  f"parse p50 {parse['p50_ms']:>8} ms")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Холодный старт воркера по профилям настроек (SETTINGS_PROFILE).
+
+Каждый прогон — отдельный процесс python -X importtime, который делает
+то же, что воркер gunicorn до первого ответа: импортирует
+invest_notes.wsgi (настройки, django.setup()) и загружает URLconf.
+Бенчмарк меряет время процесса целиком, время импортов из -X importtime,
+число импортированных модулей и самые дорогие пакеты верхнего уровня.
+С --baseline сравнивает p50 с сохранённым результатом и завершается
+с кодом 1, если он вырос больше чем на --threshold процентов.
+
+    python -m benchmarks.startup --runs 20 --output startup.json
+    python -m benchmarks.startup --baseline startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from benchmarks.common import summarize
+
+PROFILES = ('development', 'production')
+
+BOOT = '''
+from invest_notes.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+'''
+
+
+def parse_importtime(stderr):
+    """
+    Разбор вывода -X importtime: число модулей, время импортов
+    в миллисекундах всего (cumulative модулей верхнего уровня)
+    и собственное время модулей (self) по пакетам верхнего уровня.
+    """
+    packages = Counter()
+    modules = 0
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules += 1
+        packages[name.strip().split('.')[0]] += int(own) / 1000
+        # Вложенные импорты выводятся с отступом и уже учтены
+        # в cumulative импортировавшего их модуля.
+        if not name.startswith('  '):
+            total += int(cumulative) / 1000
+    return modules, total, packages
+
+
+def boot(profile):
+    env = {**os.environ, 'SETTINGS_PROFILE': profile,
+           'DJANGO_SETTINGS_MODULE': 'invest_notes.settings'}
+    if profile == 'production':
+        # Без общего кэша production-профиль не стартует; при загрузке
+        # воркера к кэшу не обращаются.
+        env.setdefault('CACHE_URL', 'file:///var/tmp/django_cache')
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT],
+        env=env, check=True, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - started
+    return elapsed, *parse_importtime(process.stderr)
+
+
+def run(profile, runs, top):
+    timings = []
+    imports = []
+    packages = Counter()
+    for _ in range(runs):
+        elapsed, modules, total, by_package = boot(profile)
+        timings.append(elapsed)
+        imports.append(total)
+        packages.update(by_package)
+    return {
+        **summarize(timings),
+        'modules': modules,
+        'imports_ms': round(statistics.median(imports), 1),
+        'packages_ms': {name: round(value / runs, 1)
+                        for name, value in packages.most_common(top)},
+    }
+
+
+def compare(results, baseline, threshold):
+    """Список регрессий p50 относительно baseline."""
+    regressions = []
+    for profile, result in results.items():
+        before = baseline.get(profile)
+        if before is None:
+            continue
+        if result['p50_ms'] > before['p50_ms'] * (1 + threshold / 100):
+            regressions.append(f'{profile}: p50 {before["p50_ms"]} ms -> '
+                               f'{result["p50_ms"]} ms')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES,
+                        default=list(PROFILES))
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10,
+                        help='сколько самых дорогих пакетов показать')
+    parser.add_argument('--output', help='файл для JSON с результатами')
+    parser.add_argument('--baseline', help='JSON с прошлыми результатами')
+    parser.add_argument('--threshold', type=float, default=20,
+                        help='допустимый рост p50, в процентах')
+    args = parser.parse_args()
+
+    results = {}
+    for profile in args.profiles:
+        results[profile] = run(profile, args.runs, args.top)
+        print(f'{profile:<12} p50 {results[profile]["p50_ms"]:>8} ms  '
+              f'p99 {results[profile]["p99_ms"]:>8} ms  '
+              f'imports {results[profile]["imports_ms"]:>8} ms  '
+              f'modules {results[profile]["modules"]}',
+              file=sys.stderr)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,21 @@
 import os
 
 from pathlib import Path
+from urllib.parse import urlsplit
 from datetime import timedelta
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 
 load_dotenv()
+
+
+def env_bool(name, default=False):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -22,27 +32,41 @@ DEBUG = os.getenv('DEBUG', 'DEFAULT_KEY')
 ALLOWED_HOSTS = []
 
 
+# SETTINGS_PROFILE=production не загружает админку, документацию API
+# (drf_yasg) и django_extensions, чтобы воркер и manage.py стартовали
+# быстрее. Каждый флаг ENABLE_* можно задать и отдельно.
+SETTINGS_PROFILE = os.getenv('SETTINGS_PROFILE', 'development')
+PRODUCTION = SETTINGS_PROFILE == 'production'
+
+ENABLE_ADMIN = env_bool('ENABLE_ADMIN', not PRODUCTION)
+ENABLE_API_DOCS = env_bool('ENABLE_API_DOCS', not PRODUCTION)
+ENABLE_DEV_APPS = env_bool('ENABLE_DEV_APPS', not PRODUCTION)
+
+
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    *(['django.contrib.admin'] if ENABLE_ADMIN else []),
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'notes',
 
     'rest_framework',
-    'drf_yasg',
+    *(['drf_yasg'] if ENABLE_API_DOCS else []),
     'djoser',
     'rest_framework_simplejwt',
     'django_filters',
-    'django_extensions',
+    *(['django_extensions'] if ENABLE_DEV_APPS else []),
 ]
 
 MIDDLEWARE = [
+    'notes.middleware.RequestTimingMiddleware',
+    'notes.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,6 +106,17 @@ WSGI_APPLICATION = 'invest_notes.wsgi.application'
 #     }
 # }
 
+# DB_POOL включает пул соединений psycopg; пул несовместим с
+# CONN_MAX_AGE, поэтому без пула соединения переиспользуются
+# между запросами в течение DB_CONN_MAX_AGE секунд.
+DB_POOL = env_bool('DB_POOL')
+
+DB_POOL_OPTIONS = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -90,10 +125,49 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD", "DEFAULT_KEY"),
         "HOST": os.getenv("DB_HOST", "DEFAULT_KEY"),
         "PORT": os.getenv("DB_PORT", "DEFAULT_KEY"),
+        "CONN_MAX_AGE": (0 if DB_POOL
+                         else int(os.getenv("DB_CONN_MAX_AGE", 60))),
+        "CONN_HEALTH_CHECKS": env_bool("DB_CONN_HEALTH_CHECKS", True),
+        "OPTIONS": {"pool": DB_POOL_OPTIONS} if DB_POOL else {},
     }
 }
 
 
+# Cache
+# CACHE_URL: redis://host:6379/0, file:///var/tmp/django_cache,
+# db://cache_table (после createcachetable) или locmem:// для разработки.
+# В кэше лежат версии данных пользователей (notes.versions): у locmem
+# они свои в каждом воркере, и воркеры отдают устаревшие 304 и списки,
+# поэтому production-профиль требует общий кэш.
+
+CACHE_URL = urlsplit(os.getenv('CACHE_URL', 'locmem://'))
+
+if PRODUCTION and CACHE_URL.scheme == 'locmem':
+    raise ImproperlyConfigured(
+        'SETTINGS_PROFILE=production требует общий для воркеров кэш: '
+        'задайте CACHE_URL (redis://, file:// или db://).')
+
+CACHE_BACKENDS = {
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_URL.scheme],
+        'LOCATION': (CACHE_URL.geturl()
+                     if CACHE_URL.scheme.startswith('redis')
+                     else CACHE_URL.netloc + CACHE_URL.path),
+        'KEY_PREFIX': 'invest_notes',
+    }
+}
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -137,30 +211,100 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = "notes.User"
 
-EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+# Письма (в том числе активация djoser) складываются в очередь
+# OutgoingEmail и отправляются командой send_queued_mail через
+# EMAIL_OUTBOX_BACKEND, поэтому регистрация не ждёт SMTP.
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'notes.mail.OutboxEmailBackend')
+EMAIL_OUTBOX_BACKEND = os.getenv(
+    'EMAIL_OUTBOX_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+EMAIL_OUTBOX_RETRY_DELAY = timedelta(
+    seconds=int(os.getenv('EMAIL_OUTBOX_RETRY_DELAY', 60)))
 
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'notes.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
+        'notes.throttling.UserFixedWindowThrottle',
+        'notes.throttling.AnonFixedWindowThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'user': '10000/day',
         'anon': '1000/day',
     },
+    # JSON через orjson (без него — стандартный json), browsable API
+    # по-прежнему рендерит через JSONRenderer с отступами.
+    'DEFAULT_RENDERER_CLASSES': [
+        'notes.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'notes.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 100))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 1000))
+API_MAX_BULK_SIZE = int(os.getenv('API_MAX_BULK_SIZE', 1000))
+# Заметок в одной пачке серверного курсора при экспорте.
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+# Записей в одной транзакции импорта.
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+
 SIMPLE_JWT = {
    'AUTH_HEADER_TYPES': ('JWT',),
    'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+JWT_USER_CACHE_TIMEOUT = int(os.getenv('JWT_USER_CACHE_TIMEOUT', 300))
+# Время жизни закэшированного списка меток, 0 отключает кэш.
+LABEL_LIST_CACHE_TIMEOUT = int(os.getenv('LABEL_LIST_CACHE_TIMEOUT', 3600))
+
+# REQUEST_TIMING включает заголовок Server-Timing и лог notes.timing
+# с числом SQL-запросов, временем SQL, аутентификации и сериализации.
+REQUEST_TIMING = env_bool('REQUEST_TIMING')
+REQUEST_TIMING_DUPLICATE_THRESHOLD = int(
+    os.getenv('REQUEST_TIMING_DUPLICATE_THRESHOLD', 3))
+
+# Сжатие ответов: zstd и br при установленных zstandard и brotli,
+# иначе gzip. Уровень — компромисс между CPU и трафиком.
+COMPRESSION = env_bool('COMPRESSION', True)
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_LEVELS = {
+    'gzip': int(os.getenv('COMPRESSION_GZIP_LEVEL', 6)),
+    'br': int(os.getenv('COMPRESSION_BROTLI_LEVEL', 5)),
+    'zstd': int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3)),
+}
+COMPRESSION_CONTENT_TYPES = (
+    'application/json',
+    'application/openapi+json',
+    'application/x-ndjson',
+    'application/yaml',
+    'application/javascript',
+    'image/svg+xml',
+    'text/',
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'notes': {
+            'handlers': ['console'],
+            'level': os.getenv('NOTES_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 DJOSER = {
     'SEND_ACTIVATION_EMAIL': True,
     'USER_CREATE_PASSWORD_RETYPE': True,
@@ -172,3 +316,25 @@ DJOSER = {
 }
 
 SWAGGER_USE_COMPAT_RENDERERS = False
+
+# API_SCHEMA_STATIC отдаёт /api/swagger.json из файла, собранного
+# командой generate_schema (или сгенерированного один раз при первом
+# обращении), с ETag и Last-Modified. UI swagger/redoc берут схему оттуда.
+API_SCHEMA_STATIC = env_bool('API_SCHEMA_STATIC')
+API_SCHEMA_FILE = Path(os.getenv('API_SCHEMA_FILE',
+                                 BASE_DIR / 'openapi' / 'swagger.json'))
+API_SCHEMA_CACHE_TIMEOUT = int(os.getenv('API_SCHEMA_CACHE_TIMEOUT', 0))
+
+SWAGGER_SETTINGS = {
+    'DEFAULT_SPEC_RENDERERS': [
+        'drf_yasg.renderers.SwaggerYAMLRenderer',
+        'notes.schema.FastSwaggerJSONRenderer',
+        'notes.schema.FastOpenAPIRenderer',
+    ],
+    'SPEC_URL': (('schema-json', {'format': 'json'})
+                 if API_SCHEMA_STATIC else None),
+}
+
+REDOC_SETTINGS = {
+    'SPEC_URL': SWAGGER_SETTINGS['SPEC_URL'],
+}
@@ -1,9 +1,12 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 
 
 urlpatterns = [
     path('api/', include('notes.urls')),
-
-    path('admin/', admin.site.urls),
 ]
+
+if settings.ENABLE_ADMIN:
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
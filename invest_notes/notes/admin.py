@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Label
+from .models import User, Label, OutgoingEmail
 
 admin.site.register(User, UserAdmin)
 admin.site.register(Label)
+admin.site.register(OutgoingEmail)
@@ -0,0 +1,149 @@
+"""
+Асинхронные views меток без DRF: список, просмотр и создание.
+Аутентификация, лимиты запросов и ответы об ошибках повторяют
+LabelViewSet, запросы к БД идут через асинхронный ORM.
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+from .authentication import CachedJWTAuthentication
+from .models import Label
+from .pagination import (LabelPagination, decode_cursor, get_page_links,
+                         page_queryset, split_page)
+from .serializers import (LABEL_TITLE_EXISTS, LabelSerializer,
+                          is_label_title_conflict)
+
+authentication = CachedJWTAuthentication()
+
+# Как JSONRenderer DRF (UNICODE_JSON, COMPACT_JSON): тела ответов
+# совпадают с ответами LabelViewSet байт в байт.
+JSON_DUMPS_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def json_response(data, **kwargs):
+    return JsonResponse(data, json_dumps_params=JSON_DUMPS_PARAMS, **kwargs)
+
+
+def error_response(exc):
+    detail = exc.detail
+    if not isinstance(detail, (dict, list)):
+        detail = {'detail': detail}
+    response = json_response(detail, status=exc.status_code, safe=False)
+    if isinstance(exc, (exceptions.AuthenticationFailed,
+                        exceptions.NotAuthenticated)):
+        response['WWW-Authenticate'] = authentication.authenticate_header(
+            None)
+    if getattr(exc, 'wait', None) is not None:
+        response['Retry-After'] = str(int(exc.wait))
+    return response
+
+
+async def check_throttles(request):
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if hasattr(throttle, 'aallow_request'):
+            allowed = await throttle.aallow_request(request, None)
+        else:
+            allowed = await sync_to_async(throttle.allow_request)(
+                request, None)
+        if not allowed:
+            raise exceptions.Throttled(throttle.wait())
+
+
+def async_api_view(view):
+    """
+    JWT-аутентификация и лимиты запросов для асинхронной view.
+    Ошибки DRF (APIException) превращаются в JSON-ответ.
+    """
+    @csrf_exempt
+    @wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        try:
+            result = await authentication.aauthenticate(request)
+            if result is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = result
+            await check_throttles(request)
+            return await view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return error_response(exc)
+    return wrapped
+
+
+def get_page_size(request):
+    try:
+        page_size = int(request.GET['page_size'])
+    except (KeyError, ValueError):
+        return settings.API_PAGE_SIZE
+    return min(max(page_size, 1), settings.API_MAX_PAGE_SIZE)
+
+
+@require_http_methods(['GET', 'POST'])
+@async_api_view
+async def label_list(request):
+    """
+    GET — метки пользователя по (title, id) страницами с курсорами
+    next и previous, как у LabelViewSet. POST — создание метки.
+    """
+    if request.method == 'POST':
+        return await create_label(request)
+
+    queryset = Label.objects.filter(owner_id=request.user.id)
+    ordering = LabelPagination.ordering
+    cursor = request.GET.get('cursor')
+    if cursor is not None:
+        try:
+            cursor = decode_cursor(cursor, ordering, queryset)
+        except ValueError:
+            raise exceptions.NotFound(LabelPagination.invalid_cursor_message)
+    page_size = get_page_size(request)
+    results = [label async for label in page_queryset(
+        queryset.values('id', 'title', 'note_count'), ordering, cursor,
+        page_size)]
+    labels, has_next, has_previous = split_page(results, cursor, page_size)
+    next_url, previous_url = get_page_links(
+        request.build_absolute_uri(), ordering, cursor, labels, has_next,
+        has_previous)
+    return json_response({'next': next_url, 'previous': previous_url,
+                          'results': labels})
+
+
+async def create_label(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError as exc:
+            raise exceptions.ParseError(f'JSON parse error - {exc}')
+    else:
+        data = request.POST
+    serializer = LabelSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        label = await Label.objects.acreate(
+            owner_id=request.user.id, **serializer.validated_data)
+    except IntegrityError as exc:
+        if not is_label_title_conflict(exc):
+            raise
+        raise exceptions.ValidationError({'title': [LABEL_TITLE_EXISTS]})
+    return json_response({'id': label.pk, 'title': label.title,
+                          'note_count': label.note_count}, status=201)
+
+
+@require_http_methods(['GET'])
+@async_api_view
+async def label_detail(request, pk):
+    try:
+        label = await (Label.objects.filter(owner_id=request.user.id)
+                       .values('id', 'title', 'note_count').aget(pk=pk))
+    except Label.DoesNotExist:
+        raise exceptions.NotFound('No Label matches the given query.')
+    return json_response(label)
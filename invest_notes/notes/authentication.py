@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .timing import timed
+
+# Поля пользователя в кэше; остальные поля (хэш пароля в том числе)
+# не кэшируются и читаются из БД при обращении к ним.
+CACHED_USER_FIELDS = ('id', 'username', 'email', 'is_active')
+
+
+def user_cache_key(user_id):
+    return f'auth:user-fields:{user_id}'
+
+
+def user_cache_entry(user):
+    """
+    Значение кэша: поля CACHED_USER_FIELDS и md5 хэша пароля,
+    с которым simplejwt сверяет токен (CHECK_REVOKE_TOKEN).
+    """
+    entry = {name: getattr(user, name) for name in CACHED_USER_FIELDS}
+    entry['password_md5'] = get_md5_hash_password(user.password)
+    return entry
+
+
+def invalidate_user_cache(user_id):
+    """Сбрасывает кэш сейчас и после коммита текущей транзакции."""
+    key = user_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация, которая берёт пользователя из общего кэша.
+    В БД идёт только первый запрос после истечения или сброса кэша,
+    сброс выполняют сигналы сохранения и удаления User. Из кэша
+    собирается пользователь с отложенными полями, кроме
+    CACHED_USER_FIELDS.
+    """
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        key = user_cache_key(self.get_user_id(validated_token))
+        entry = cache.get(key)
+        if entry is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user_cache_entry(user),
+                      settings.JWT_USER_CACHE_TIMEOUT)
+            return user
+        self.check_user(entry, validated_token)
+        return self.build_user(entry)
+
+    async def aauthenticate(self, request):
+        """Асинхронный authenticate для views без DRF."""
+        with timed('auth'):
+            header = self.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+            validated_token = self.get_validated_token(raw_token)
+            return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        key = user_cache_key(user_id)
+        entry = await cache.aget(key)
+        if entry is None:
+            try:
+                user = await self.user_model.objects.aget(
+                    **{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_('User not found'),
+                                           code='user_not_found') from e
+            entry = user_cache_entry(user)
+            self.check_user(entry, validated_token)
+            await cache.aset(key, entry, settings.JWT_USER_CACHE_TIMEOUT)
+            return user
+        self.check_user(entry, validated_token)
+        return self.build_user(entry)
+
+    def build_user(self, entry):
+        # from_db ждёт значения в порядке полей модели.
+        names = [field.attname
+                 for field in self.user_model._meta.concrete_fields
+                 if field.attname in CACHED_USER_FIELDS]
+        return self.user_model.from_db(None, names,
+                                       [entry[name] for name in names])
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification')
+            ) from e
+
+    def check_user(self, entry, validated_token):
+        """Проверки simplejwt для пользователя по значению кэша."""
+        if api_settings.CHECK_USER_IS_ACTIVE and not entry['is_active']:
+            raise AuthenticationFailed(_('User is inactive'),
+                                       code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != entry['password_md5']:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."),
+                    code='password_changed')
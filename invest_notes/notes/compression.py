@@ -0,0 +1,113 @@
+"""
+Кодеки сжатия ответов для CompressionMiddleware: gzip всегда,
+brotli и zstd — из пакетов brotli и zstandard (requirements.txt);
+без них middleware отдаёт только gzip.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class GzipCodec:
+    encoding = 'gzip'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compressobj(self):
+        # wbits 31 — формат gzip (16) с окном 32 КБ (15).
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        compressor = self.compressobj()
+        return compressor.compress(data) + compressor.flush()
+
+
+class BrotliCompressor:
+    """brotli.Compressor с интерфейсом zlib: compress() и flush()."""
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+class BrotliCodec(GzipCodec):
+    encoding = 'br'
+
+    def compressobj(self):
+        return BrotliCompressor(self.level)
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+
+class ZstdCodec(GzipCodec):
+    encoding = 'zstd'
+
+    def compressobj(self):
+        return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+
+def get_codecs(levels):
+    """
+    Доступные кодеки в порядке предпочтения сервера,
+    levels — уровень сжатия по имени кодировки.
+    """
+    codecs = []
+    if zstandard is not None:
+        codecs.append(ZstdCodec(levels['zstd']))
+    if brotli is not None:
+        codecs.append(BrotliCodec(levels['br']))
+    codecs.append(GzipCodec(levels['gzip']))
+    return codecs
+
+
+def parse_accept_encoding(header):
+    """Кодировка -> q из заголовка Accept-Encoding."""
+    weights = {}
+    for item in header.split(','):
+        name, *params = item.split(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    return weights
+
+
+def choose_codec(codecs, header):
+    """
+    Кодек с наибольшим q у клиента; при равных q — первый
+    в порядке сервера. None, если подходящего нет.
+    """
+    weights = parse_accept_encoding(header)
+    default = weights.get('*', 0.0)
+    best, best_q = None, 0.0
+    for codec in codecs:
+        q = weights.get(codec.encoding, default)
+        if q > best_q:
+            best, best_q = codec, q
+    return best
@@ -0,0 +1,99 @@
+"""
+Потоковый экспорт заметок. Заметки читаются серверным курсором
+пачками по chunk_size, метки подгружаются одним запросом на пачку,
+поэтому память не зависит от числа заметок автора.
+"""
+import csv
+import json
+
+from .serializers import format_datetime
+
+CSV_HEADER = ('id', 'created_at', 'text', 'labels')
+# Разделитель названий меток в колонке labels CSV; разделитель
+# и обратная косая черта внутри названия экранируются ESCAPE.
+LABELS_SEPARATOR = '|'
+ESCAPE = '\\'
+
+
+class Echo:
+    """Буфер для csv.writer, который возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def iter_chunks(queryset, chunk_size):
+    """Объекты queryset списками по chunk_size."""
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def note_titles(note):
+    return [label.title for label in note.labels.all()]
+
+
+def join_titles(titles):
+    """Колонка labels CSV из названий меток."""
+    return LABELS_SEPARATOR.join(
+        title.replace(ESCAPE, ESCAPE * 2)
+        .replace(LABELS_SEPARATOR, ESCAPE + LABELS_SEPARATOR)
+        for title in titles)
+
+
+def split_titles(value):
+    """Названия меток из колонки labels CSV, обратная к join_titles."""
+    if ESCAPE not in value:
+        return value.split(LABELS_SEPARATOR)
+    titles, title, escaped = [], [], False
+    for char in value:
+        if escaped:
+            title.append(char)
+            escaped = False
+        elif char == ESCAPE:
+            escaped = True
+        elif char == LABELS_SEPARATOR:
+            titles.append(''.join(title))
+            title = []
+        else:
+            title.append(char)
+    titles.append(''.join(title))
+    return titles
+
+
+def export_ndjson(labels, notes, chunk_size):
+    """
+    Сначала все метки ({"type": "label"}), затем заметки
+    ({"type": "note"}) с названиями меток.
+    """
+    for chunk in iter_chunks(labels, chunk_size):
+        yield ''.join(json.dumps({'type': 'label', 'id': label.pk,
+                                  'title': label.title},
+                                 ensure_ascii=False) + '\n'
+                      for label in chunk)
+    for chunk in iter_chunks(notes, chunk_size):
+        yield ''.join(json.dumps({
+            'type': 'note',
+            'id': note.pk,
+            'created_at': format_datetime(note.created_at),
+            'text': note.text,
+            'labels': note_titles(note),
+        }, ensure_ascii=False) + '\n' for note in chunk)
+
+
+def export_csv(notes, chunk_size):
+    """Заметки по строке, метки — названиями (см. join_titles)."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for chunk in iter_chunks(notes, chunk_size):
+        yield ''.join(writer.writerow((
+            note.pk,
+            format_datetime(note.created_at),
+            note.text,
+            join_titles(note_titles(note)),
+        )) for note in chunk)
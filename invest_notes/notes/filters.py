@@ -0,0 +1,136 @@
+import operator
+from functools import reduce
+
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank, TrigramWordSimilarity)
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from .models import SEARCH_CONFIG
+
+
+class TrigramSearchFilter(filters.SearchFilter):
+    """
+    Поиск по подстроке с ранжированием по триграммному сходству.
+    Условие icontains обслуживается GIN-индексом gin_trgm_ops
+    по UPPER(поле), результаты сортируются по убыванию rank.
+    """
+    rank_field = 'rank'
+
+    def filter_queryset(self, request, queryset, view):
+        queryset = super().filter_queryset(request, queryset, view)
+        search_terms = self.get_search_terms(request)
+        search_fields = self.get_search_fields(view, request)
+        if not search_terms or not search_fields:
+            return queryset
+        return queryset.annotate(**{self.rank_field: TrigramWordSimilarity(
+            ' '.join(search_terms), search_fields[0])})
+
+    def get_ordering(self, request, queryset, view):
+        """Порядок для курсорной пагинации при активном поиске."""
+        if not self.get_search_terms(request):
+            return None
+        pagination_class = getattr(view, 'pagination_class', None)
+        ordering = getattr(pagination_class, 'ordering', None)
+        if not ordering:
+            ordering = queryset.model._meta.ordering
+        return (f'-{self.rank_field}', *ordering)
+
+
+class LabelIdsFilter(filters.BaseFilterBackend):
+    """
+    Заметки по меткам через денормализованный Note.label_ids:
+    ?labels=1,2 — есть все метки, ?labels_any=1,2 — хотя бы одна.
+    Условие вместе с автором обслуживает GIN-индекс (author, label_ids).
+    """
+    lookups = {'labels': 'contains', 'labels_any': 'overlap'}
+
+    def filter_queryset(self, request, queryset, view):
+        for param, lookup in self.lookups.items():
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                ids = sorted({int(pk) for pk in value.split(',')})
+            except ValueError:
+                raise ValidationError(
+                    {param: ['Expected a comma-separated list of ids.']})
+            queryset = queryset.filter(**{f'label_ids__{lookup}': ids})
+        return queryset
+
+
+class LabelUsageFilter(filters.BaseFilterBackend):
+    """
+    Метки по числу заметок Label.note_count: ?min_notes=, ?max_notes=
+    (?max_notes=0 — неиспользуемые метки) и ?ordering=-note_count —
+    самые используемые первыми (note_count — наоборот). Условие
+    и сортировку вместе с владельцем обслуживает индекс
+    (owner, note_count, id).
+    """
+    ordering_param = 'ordering'
+    orderings = {
+        'title': None,
+        'note_count': ('note_count', 'id'),
+        '-note_count': ('-note_count', '-id'),
+    }
+    lookups = {'min_notes': 'gte', 'max_notes': 'lte'}
+
+    def filter_queryset(self, request, queryset, view):
+        for param, lookup in self.lookups.items():
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                count = int(value)
+            except ValueError:
+                count = -1
+            if count < 0:
+                raise ValidationError(
+                    {param: ['Expected a non-negative integer.']})
+            queryset = queryset.filter(**{f'note_count__{lookup}': count})
+        ordering = self.get_ordering(request, queryset, view)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def get_ordering(self, request, queryset, view):
+        """Порядок для курсорной пагинации, None — порядок по умолчанию."""
+        value = request.query_params.get(self.ordering_param)
+        if not value:
+            return None
+        if value not in self.orderings:
+            raise ValidationError({self.ordering_param: [
+                f'Expected one of: {", ".join(self.orderings)}.']})
+        return self.orderings[value]
+
+
+class NoteSearchFilter(TrigramSearchFilter):
+    """
+    Полнотекстовый поиск по заметкам автора: websearch-запрос
+    к Note.search_vector (GIN-индекс (author, search_vector)),
+    ранжирование ts_rank и фрагмент текста с подсветкой в headline.
+    Подстроки, которых нет среди лексем (часть тикера, короткие токены),
+    находит запасное условие icontains по триграммному индексу.
+    """
+    search_field = 'text'
+    headline_field = 'headline'
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        query = SearchQuery(' '.join(search_terms), config=SEARCH_CONFIG,
+                            search_type='websearch')
+        fallback = reduce(operator.and_, (
+            Q(**{f'{self.search_field}__icontains': term})
+            for term in search_terms))
+        return queryset.filter(Q(search_vector=query) | fallback).annotate(**{
+            # ts_rank возвращает real; double precision сохраняет
+            # позицию курсора пагинации без потери точности.
+            self.rank_field: Cast(SearchRank(F('search_vector'), query),
+                                  FloatField()),
+            self.headline_field: SearchHeadline(
+                self.search_field, query, config=SEARCH_CONFIG,
+                start_sel='<mark>', stop_sel='</mark>', max_fragments=2),
+        })
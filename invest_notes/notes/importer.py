@@ -0,0 +1,246 @@
+"""
+Потоковый импорт заметок из NDJSON или CSV в формате экспорта.
+Записи читаются по строке и пишутся пачками: метки пачки создаются
+одним INSERT ... ON CONFLICT DO NOTHING и перечитываются одним
+запросом, заметки и связи с метками — через bulk_create.
+"""
+import codecs
+import csv
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from rest_framework import serializers
+
+from .export import split_titles
+from .models import Label, Note
+from .validators import validate_title
+from .versions import LABELS, NOTES, bump_data_version
+
+FORMATS = ('ndjson', 'csv')
+LABEL_TITLE_MAX_LENGTH = Label._meta.get_field('title').max_length
+# Сколько ошибок разбора хранить в отчёте.
+MAX_REPORTED_ERRORS = 100
+# Разбор created_at, обратный format_datetime экспорта.
+parse_datetime = serializers.DateTimeField().to_internal_value
+
+
+class RecordError(ValueError):
+    pass
+
+
+@dataclass
+class ImportResult:
+    notes: int = 0
+    labels: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+
+def detect_format(content_type='', name=''):
+    """Формат по MIME-типу или расширению файла; по умолчанию NDJSON."""
+    if 'csv' in content_type or name.lower().endswith('.csv'):
+        return 'csv'
+    return 'ndjson'
+
+
+def read_lines(stream):
+    """
+    Строки текста (с переводом строки) из бинарного потока
+    без чтения его целиком.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    tail = ''
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        *lines, tail = (tail + decoder.decode(chunk)).split('\n')
+        for line in lines:
+            yield line + '\n'
+    tail += decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def clean_created_at(value):
+    """Дата создания из записи; None — запись без даты."""
+    if value is None or value == '':
+        return None
+    try:
+        return parse_datetime(value)
+    except serializers.ValidationError:
+        raise RecordError('Field "created_at" must be an ISO 8601 '
+                          'date and time.')
+
+
+def clean_record(text, labels):
+    if not isinstance(text, str) or not text.strip():
+        raise RecordError('Field "text" is required.')
+    if not isinstance(labels, list):
+        raise RecordError('Field "labels" must be a list of titles.')
+    titles = []
+    for title in labels:
+        if not isinstance(title, str):
+            raise RecordError('Label titles must be strings.')
+        title = validate_title(title)
+        if len(title) > LABEL_TITLE_MAX_LENGTH:
+            raise RecordError(f'Label title is longer than '
+                              f'{LABEL_TITLE_MAX_LENGTH} characters.')
+        if title:
+            titles.append(title)
+    return text, titles
+
+
+def parse_ndjson(lines):
+    """
+    (номер строки, текст, метки, дата создания)
+    или (номер строки, RecordError).
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise RecordError('Expected a JSON object.')
+            kind = record.get('type', 'note')
+            if kind == 'label':
+                yield number, None, clean_record(
+                    '-', [record.get('title')])[1], None
+            elif kind == 'note':
+                yield number, *clean_record(record.get('text'),
+                                            record.get('labels', [])), \
+                    clean_created_at(record.get('created_at'))
+            else:
+                raise RecordError(f'Unknown record type "{kind}".')
+        except ValueError as exc:
+            yield number, exc
+
+
+def parse_csv(lines):
+    reader = csv.DictReader(lines)
+    for record in reader:
+        number = reader.line_num
+        labels = record.get('labels') or ''
+        try:
+            yield number, *clean_record(
+                record.get('text'), split_titles(labels)), \
+                clean_created_at(record.get('created_at'))
+        except RecordError as exc:
+            yield number, exc
+
+
+def resolve_labels(owner, titles):
+    """
+    id меток владельца по названиям без учёта регистра. Недостающие
+    создаются bulk_create(ignore_conflicts=True): конфликт по
+    unique_label_per_user_case_insensitive оставляет существующую метку.
+    """
+    wanted = {}
+    for title in titles:
+        wanted.setdefault(title.lower(), title)
+    if not wanted:
+        return {}, 0
+
+    def select():
+        return dict(Label.objects
+                    .annotate(title_lower=Lower('title'))
+                    .filter(owner=owner, title_lower__in=wanted)
+                    .values_list('title_lower', 'id'))
+
+    ids = select()
+    missing = [Label(owner=owner, title=title)
+               for key, title in wanted.items() if key not in ids]
+    if not missing:
+        return ids, 0
+    Label.objects.bulk_create(missing, ignore_conflicts=True)
+    created = select()
+    return created, len(created) - len(ids)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def reserve_note_ids(cursor, count):
+    cursor.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+        "FROM generate_series(1, %s)", [Note._meta.db_table, count])
+    return [row[0] for row in cursor.fetchall()]
+
+
+def insert_note_labels(cursor, links):
+    """
+    Связи заметок с метками одним INSERT из двух массивов: для сотен
+    тысяч строк это заметно быстрее, чем модели through в bulk_create.
+    """
+    if links:
+        note_ids, label_ids = zip(*links)
+        cursor.execute(
+            f'INSERT INTO {Note.labels.through._meta.db_table} '
+            f'(note_id, label_id) '
+            f'SELECT * FROM unnest(%s::bigint[], %s::bigint[])',
+            [list(note_ids), list(label_ids)])
+
+
+def import_batch(owner, batch, result):
+    """
+    Связи с метками вставляются раньше заметок (внешние ключи
+    проверяются в конце транзакции): тогда триггер заполняет
+    Note.label_ids при вставке заметки, без отдельного UPDATE.
+    """
+    titles = [title for _, _, labels, _ in batch for title in labels]
+    notes = [(Note(author=owner, text=text,
+                   **({'created_at': created_at} if created_at else {})),
+              labels)
+             for _, text, labels, created_at in batch if text is not None]
+    with transaction.atomic(), connection.cursor() as cursor:
+        label_ids, created = resolve_labels(owner, titles)
+        for (note, _), pk in zip(notes, reserve_note_ids(cursor,
+                                                         len(notes))):
+            note.pk = pk
+        insert_note_labels(cursor, [
+            (note.pk, label_id)
+            for note, labels in notes
+            for label_id in dict.fromkeys(
+                label_ids.get(title.lower()) for title in labels)
+            if label_id is not None])
+        Note.objects.bulk_create(note for note, _ in notes)
+    result.notes += len(notes)
+    result.labels += created
+
+
+def import_notes(owner, lines, format='ndjson', batch_size=1000,
+                 progress=None):
+    """
+    Импортирует записи владельцу owner. Каждая пачка из batch_size
+    записей — отдельная транзакция, после неё вызывается
+    progress(result). Ошибочные записи пропускаются и попадают
+    в result.errors.
+    """
+    records = (parse_csv if format == 'csv' else parse_ndjson)(lines)
+    result = ImportResult()
+    try:
+        for chunk in batched(records, batch_size):
+            batch = []
+            for record in chunk:
+                if isinstance(record[1], ValueError):
+                    result.add_error(record[0], str(record[1]))
+                else:
+                    batch.append(record)
+            if batch:
+                import_batch(owner, batch, result)
+            if progress:
+                progress(result)
+    finally:
+        # bulk_create не отправляет сигналы post_save.
+        if result.notes or result.labels:
+            bump_data_version(owner.pk, LABELS, NOTES)
+    return result
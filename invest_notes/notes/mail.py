@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+from .models import OutgoingEmail
+
+
+def to_outgoing(message):
+    html_body = next((content for content, mimetype
+                      in getattr(message, 'alternatives', ())
+                      if mimetype == 'text/html'), '')
+    return OutgoingEmail(
+        subject=message.subject, body=message.body, html_body=html_body,
+        from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(message.to), cc=list(message.cc), bcc=list(message.bcc),
+        reply_to=list(message.reply_to), headers=dict(message.extra_headers))
+
+
+def to_message(email, connection=None):
+    message = EmailMultiAlternatives(
+        subject=email.subject, body=email.body, from_email=email.from_email,
+        to=email.to, cc=email.cc, bcc=email.bcc, reply_to=email.reply_to,
+        headers=email.headers, connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """
+    Вместо отправки сохраняет письма в таблицу OutgoingEmail,
+    доставку выполняет команда send_queued_mail. Письма с вложениями
+    очередь не хранит и отправляет сразу через EMAIL_OUTBOX_BACKEND.
+    """
+
+    def send_messages(self, email_messages):
+        queued = [message for message in email_messages
+                  if not message.attachments]
+        direct = [message for message in email_messages
+                  if message.attachments]
+        OutgoingEmail.objects.bulk_create(map(to_outgoing, queued))
+        sent = len(queued)
+        if direct:
+            connection = get_connection(settings.EMAIL_OUTBOX_BACKEND,
+                                        fail_silently=self.fail_silently)
+            sent += connection.send_messages(direct) or 0
+        return sent
+
+
+def send_queued_mail(batch_size):
+    """
+    Отправляет одну пачку писем из очереди через одно соединение
+    EMAIL_OUTBOX_BACKEND. Строки блокируются с SKIP LOCKED, поэтому
+    несколько воркеров не отправят одно письмо дважды. После ошибки
+    письмо откладывается на EMAIL_OUTBOX_RETRY_DELAY * номер попытки.
+    Возвращает количество обработанных писем.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutgoingEmail.objects
+            .filter(sent_at__isnull=True, scheduled_at__lte=now,
+                    attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS)
+            .select_for_update(skip_locked=True)[:batch_size])
+        if not emails:
+            return 0
+
+        with get_connection(settings.EMAIL_OUTBOX_BACKEND) as connection:
+            for email in emails:
+                email.attempts += 1
+                try:
+                    to_message(email, connection).send()
+                except Exception as exc:
+                    email.last_error = repr(exc)
+                    email.scheduled_at = now + (
+                        settings.EMAIL_OUTBOX_RETRY_DELAY * email.attempts)
+                else:
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+        OutgoingEmail.objects.bulk_update(
+            emails, ['attempts', 'scheduled_at', 'sent_at', 'last_error'])
+    return len(emails)
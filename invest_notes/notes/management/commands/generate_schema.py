@@ -0,0 +1,24 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes.schema import generate_schema
+
+
+class Command(BaseCommand):
+    help = ('Генерирует OpenAPI-схему API в статический файл, '
+            'который отдаётся по /api/swagger.json при API_SCHEMA_STATIC.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=Path,
+                            default=Path(settings.API_SCHEMA_FILE),
+                            help='путь к файлу схемы (API_SCHEMA_FILE)')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        output.parent.mkdir(parents=True, exist_ok=True)
+        content = generate_schema()
+        output.write_bytes(content)
+        self.stdout.write(self.style.SUCCESS(
+            f'Схема записана в {output} ({len(content)} байт)'))
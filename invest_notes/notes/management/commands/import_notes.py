@@ -0,0 +1,49 @@
+import sys
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.importer import FORMATS, detect_format, import_notes, read_lines
+
+
+class Command(BaseCommand):
+    help = 'Импортирует заметки пользователя из NDJSON или CSV файла.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path', help='файл или - для stdin')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='по умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            owner = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден')
+
+        path = options['path']
+        format = options['format'] or detect_format(name=path)
+
+        def progress(result):
+            self.stdout.write(f'Заметок: {result.notes}, '
+                              f'новых меток: {result.labels}, '
+                              f'пропущено: {result.skipped}')
+
+        if path == '-':
+            result = import_notes(owner, read_lines(sys.stdin.buffer),
+                                  format, options['batch_size'], progress)
+        else:
+            with open(path, 'rb') as file:
+                result = import_notes(owner, read_lines(file), format,
+                                      options['batch_size'], progress)
+
+        for error in result.errors:
+            self.stderr.write(f'Строка {error["line"]}: {error["error"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано заметок: {result.notes}, '
+            f'новых меток: {result.labels}, пропущено: {result.skipped}'))
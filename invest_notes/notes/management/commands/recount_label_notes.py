@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from notes.versions import LABELS, bump_data_version
+
+MISMATCHES_SQL = """
+SELECT l.id, l.note_count, count(nl.id)
+FROM notes_label l LEFT JOIN notes_note_labels nl ON nl.label_id = l.id
+WHERE l.id >= %s AND l.id < %s
+GROUP BY l.id HAVING l.note_count <> count(nl.id)
+ORDER BY l.id
+"""
+
+RECOUNT_SQL = """
+UPDATE notes_label SET note_count = counts.count
+FROM (SELECT l.id, count(nl.id) AS count
+      FROM notes_label l LEFT JOIN notes_note_labels nl ON nl.label_id = l.id
+      WHERE l.id >= %s AND l.id < %s
+      GROUP BY l.id) AS counts
+WHERE notes_label.id = counts.id AND notes_label.note_count <> counts.count
+RETURNING notes_label.owner_id
+"""
+
+
+class Command(BaseCommand):
+    help = ('Проверяет и пересчитывает Label.note_count по связям '
+            'заметок с метками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='меток в одной транзакции')
+        parser.add_argument('--verify', action='store_true',
+                            help='только проверить, ошибка при расхождениях')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT min(id), max(id) FROM notes_label')
+            first, last = cursor.fetchone()
+            if first is None:
+                return
+            total = 0
+            for start in range(first, last + 1, batch_size):
+                stop = start + batch_size
+                if options['verify']:
+                    total += self.verify(cursor, start, stop)
+                else:
+                    total += self.recount(cursor, start, stop)
+        if options['verify'] and total:
+            raise CommandError(f'Расхождений note_count: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено меток: {total}' if not options['verify']
+            else 'Расхождений нет'))
+
+    def verify(self, cursor, start, stop):
+        cursor.execute(MISMATCHES_SQL, [start, stop])
+        rows = cursor.fetchall()
+        for pk, stored, actual in rows:
+            self.stdout.write(f'Метка {pk}: note_count {stored}, '
+                              f'заметок {actual}')
+        return len(rows)
+
+    def recount(self, cursor, start, stop):
+        """
+        Метки пачки блокируются до подсчёта: связь, добавленная
+        параллельно, попадает либо в подсчёт, либо в триггер после
+        него, поэтому пересчёт безопасен под нагрузкой.
+        """
+        with transaction.atomic():
+            cursor.execute("SET LOCAL notes.recount_note_count = 'on'")
+            cursor.execute(
+                'SELECT id FROM notes_label WHERE id >= %s AND id < %s '
+                'ORDER BY id FOR NO KEY UPDATE', [start, stop])
+            cursor.execute(RECOUNT_SQL, [start, stop])
+            owners = [owner_id for owner_id, in cursor.fetchall()]
+        for owner_id in set(owners):
+            bump_data_version(owner_id, LABELS)
+        return len(owners)
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notes.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди OutgoingEmail пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true',
+                            help='работать постоянно, опрашивая очередь')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='пауза в секундах, когда очередь пуста')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = send_queued_mail(options['batch_size'])
+            total += processed
+            if processed:
+                self.stdout.write(f'Обработано писем: {processed}')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Всего обработано: {total}'))
@@ -0,0 +1,192 @@
+import json
+import logging
+from contextlib import ExitStack
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from .compression import choose_codec, get_codecs
+from .timing import activate, deactivate
+
+logger = logging.getLogger('notes.timing')
+
+
+class RequestTimingMiddleware:
+    """
+    Замеры запроса: число и время SQL-запросов, время аутентификации
+    и сериализации. Результат отдаётся в заголовке Server-Timing и
+    строкой JSON в лог notes.timing; повторяющиеся запросы (N+1)
+    пишутся предупреждением. Включается REQUEST_TIMING, без него
+    Django исключает middleware из цепочки при старте.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.REQUEST_TIMING_DUPLICATE_THRESHOLD
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timing, token = activate()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timing))
+                response = self.get_response(request)
+        finally:
+            deactivate(token)
+        return self.report(request, response, timing)
+
+    async def __acall__(self, request):
+        """
+        Под ASGI ORM работает в потоке sync_to_async этого запроса,
+        поэтому замер подключается к соединениям того потока.
+        """
+        timing, token = activate()
+        try:
+            await sync_to_async(self.wrap_connections)(timing)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(self.unwrap_connections)(timing)
+        finally:
+            deactivate(token)
+        return self.report(request, response, timing)
+
+    @staticmethod
+    def wrap_connections(timing):
+        for connection in connections.all():
+            connection.execute_wrappers.append(timing)
+
+    @staticmethod
+    def unwrap_connections(timing):
+        for connection in connections.all():
+            if timing in connection.execute_wrappers:
+                connection.execute_wrappers.remove(timing)
+
+    def report(self, request, response, timing):
+        total = timing.total()
+        metrics = {
+            'db': (timing.sql_time, f'{timing.query_count} queries'),
+            **{name: (duration, None)
+               for name, duration in timing.durations.items()},
+            'total': (total, None),
+        }
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration * 1000:.1f}'
+            + (f';desc="{desc}"' if desc else '')
+            for name, (duration, desc) in metrics.items())
+
+        duplicates = timing.duplicates(self.threshold)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': timing.query_count,
+            'duplicate_queries': sum(duplicates.values()),
+            **{f'{name}_ms': round(duration * 1000, 3)
+               for name, (duration, _) in metrics.items()},
+        }))
+        for sql, count in duplicates.items():
+            logger.warning('N+1: %s %s: %d x %s', request.method,
+                           request.path, count, sql)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов по Accept-Encoding: zstd, br или gzip (см.
+    notes.compression). Сжимаются только типы COMPRESSION_CONTENT_TYPES
+    и ответы от COMPRESSION_MIN_SIZE байт; StreamingHttpResponse
+    сжимается на лету. Сильный ETag становится слабым, чтобы
+    If-None-Match с ним по-прежнему давал 304.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.codecs = get_codecs(settings.COMPRESSION_LEVELS)
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+        self.content_types = tuple(settings.COMPRESSION_CONTENT_TYPES)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if (response.has_header('Content-Encoding')
+                or not self.is_compressible(response)):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codec = choose_codec(self.codecs,
+                             request.headers.get('Accept-Encoding', ''))
+        if codec is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async(
+                    codec, response.streaming_content)
+            else:
+                response.streaming_content = self.compress_stream(
+                    codec, response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            content = codec.compress(response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codec.encoding
+        return response
+
+    def is_compressible(self, response):
+        content_type = response.get('Content-Type', '')
+        return content_type.split(';')[0].strip().lower().startswith(
+            self.content_types)
+
+    @staticmethod
+    def compress_stream(codec, chunks):
+        compressor = codec.compressobj()
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    async def compress_async(codec, chunks):
+        compressor = codec.compressobj()
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_label_unique_label_per_user_case_insensitive'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='label',
+            options={'ordering': ('title', 'id'), 'verbose_name': 'метка', 'verbose_name_plural': 'Метки'},
+        ),
+        migrations.RemoveIndex(
+            model_name='label',
+            name='notes_label_owner_i_c75ba5_idx',
+        ),
+        migrations.AddIndex(
+            model_name='label',
+            index=models.Index(fields=['owner', 'title', 'id'], name='notes_label_owner_i_2c0e92_idx'),
+        ),
+    ]
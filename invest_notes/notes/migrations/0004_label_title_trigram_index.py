@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:47
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import (BtreeGinExtension,
+                                                TrigramExtension)
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_label_keyset_index'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        BtreeGinExtension(),
+        migrations.AddIndex(
+            model_name='label',
+            index=django.contrib.postgres.indexes.GinIndex(models.F('owner'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='label_owner_title_trgm'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:14
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 10000
+
+# notes_note.label_ids вычисляет BEFORE-триггер строки по таблице
+# notes_note_labels, поэтому save() заметки не может записать туда
+# устаревшее значение. Триггеры на уровне оператора с таблицами
+# переходов обновляют затронутые заметки одним UPDATE на оператор
+# вставки или удаления связей (add(), set(), remove(), удаление метки).
+CREATE_TRIGGERS = """
+CREATE FUNCTION notes_note_set_label_ids() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.label_ids := ARRAY(
+        SELECT label_id FROM notes_note_labels
+        WHERE note_id = NEW.id ORDER BY label_id);
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER notes_note_label_ids
+BEFORE INSERT OR UPDATE OF label_ids ON notes_note
+FOR EACH ROW EXECUTE FUNCTION notes_note_set_label_ids();
+
+CREATE FUNCTION notes_note_labels_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE notes_note SET label_ids = label_ids
+    WHERE id IN (SELECT note_id FROM changed);
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER notes_note_labels_insert
+AFTER INSERT ON notes_note_labels
+REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION notes_note_labels_changed();
+
+CREATE TRIGGER notes_note_labels_delete
+AFTER DELETE ON notes_note_labels
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION notes_note_labels_changed();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER notes_note_labels_delete ON notes_note_labels;
+DROP TRIGGER notes_note_labels_insert ON notes_note_labels;
+DROP FUNCTION notes_note_labels_changed();
+DROP TRIGGER notes_note_label_ids ON notes_note;
+DROP FUNCTION notes_note_set_label_ids();
+"""
+
+
+def backfill_label_ids(apps, schema_editor):
+    """Заполняет label_ids пачками по id, каждая пачка — своя транзакция."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT min(note_id), max(note_id) '
+                       'FROM notes_note_labels')
+        first, last = cursor.fetchone()
+        if first is None:
+            return
+        for start in range(first, last + 1, BACKFILL_BATCH_SIZE):
+            cursor.execute("""
+                UPDATE notes_note SET label_ids = label_ids
+                WHERE id IN (SELECT note_id FROM notes_note_labels
+                             WHERE note_id >= %s AND note_id < %s)
+            """, [start, start + BACKFILL_BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('notes', '0005_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='label_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, editable=False, size=None, verbose_name='ID меток'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        migrations.RunPython(backfill_label_ids, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='note',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['author', 'label_ids'], name='note_author_label_ids'),
+        ),
+    ]
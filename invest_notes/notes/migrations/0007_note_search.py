@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:16
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('notes', '0006_note_label_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('text', config='russian'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        AddIndexConcurrently(
+            model_name='note',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['author', 'search_vector'], name='note_author_search_vector'),
+        ),
+        AddIndexConcurrently(
+            model_name='note',
+            index=django.contrib.postgres.indexes.GinIndex(models.F('author'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('text'), name='gin_trgm_ops'), name='note_author_text_trgm'),
+        ),
+    ]
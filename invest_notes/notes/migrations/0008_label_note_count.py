@@ -0,0 +1,118 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:57
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+
+BACKFILL_BATCH_SIZE = 10000
+
+# notes_label.note_count меняют триггеры на уровне оператора на
+# notes_note_labels: одно UPDATE на вставку или удаление связей.
+# Строки меток блокируются заранее в порядке id, чтобы параллельные
+# операции над несколькими метками не взаимоблокировались.
+# BEFORE-триггер метки не даёт save() записать устаревшее значение:
+# вне триггеров note_count меняется только при notes.recount_note_count
+# (команда recount_label_notes).
+CREATE_TRIGGERS = """
+CREATE FUNCTION notes_label_note_count_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    delta integer := CASE TG_OP WHEN 'INSERT' THEN 1 ELSE -1 END;
+BEGIN
+    PERFORM 1 FROM notes_label
+    WHERE id IN (SELECT label_id FROM changed)
+    ORDER BY id FOR NO KEY UPDATE;
+    UPDATE notes_label SET note_count = note_count + delta * counts.count
+    FROM (SELECT label_id, count(*) AS count
+          FROM changed GROUP BY label_id) AS counts
+    WHERE notes_label.id = counts.label_id;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER notes_label_note_count_insert
+AFTER INSERT ON notes_note_labels
+REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION notes_label_note_count_changed();
+
+CREATE TRIGGER notes_label_note_count_delete
+AFTER DELETE ON notes_note_labels
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION notes_label_note_count_changed();
+
+CREATE FUNCTION notes_label_keep_note_count() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        NEW.note_count := 0;
+    ELSE
+        NEW.note_count := OLD.note_count;
+    END IF;
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER notes_label_note_count
+BEFORE INSERT OR UPDATE OF note_count ON notes_label
+FOR EACH ROW
+WHEN (pg_trigger_depth() = 0 AND current_setting(
+    'notes.recount_note_count', true) IS DISTINCT FROM 'on')
+EXECUTE FUNCTION notes_label_keep_note_count();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER notes_label_note_count ON notes_label;
+DROP FUNCTION notes_label_keep_note_count();
+DROP TRIGGER notes_label_note_count_delete ON notes_note_labels;
+DROP TRIGGER notes_label_note_count_insert ON notes_note_labels;
+DROP FUNCTION notes_label_note_count_changed();
+"""
+
+
+def backfill_note_count(apps, schema_editor):
+    """
+    Пересчитывает note_count пачками по id. Метки пачки блокируются
+    до подсчёта, поэтому связи, добавленные параллельно, учитываются
+    ровно один раз: либо в подсчёте, либо триггером после него.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT min(id), max(id) FROM notes_label')
+        first, last = cursor.fetchone()
+        if first is None:
+            return
+        for start in range(first, last + 1, BACKFILL_BATCH_SIZE):
+            stop = start + BACKFILL_BATCH_SIZE
+            with transaction.atomic(using=connection.alias):
+                cursor.execute(
+                    "SET LOCAL notes.recount_note_count = 'on'")
+                cursor.execute(
+                    'SELECT id FROM notes_label WHERE id >= %s AND id < %s '
+                    'ORDER BY id FOR NO KEY UPDATE', [start, stop])
+                cursor.execute("""
+                    UPDATE notes_label SET note_count = (
+                        SELECT count(*) FROM notes_note_labels
+                        WHERE label_id = notes_label.id)
+                    WHERE id >= %s AND id < %s
+                """, [start, stop])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('notes', '0007_note_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='label',
+            name='note_count',
+            field=models.IntegerField(db_default=0, editable=False, verbose_name='Заметок с меткой'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        migrations.RunPython(backfill_note_count, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='label',
+            index=models.Index(fields=['owner', 'note_count', 'id'], name='label_owner_note_count'),
+        ),
+    ]
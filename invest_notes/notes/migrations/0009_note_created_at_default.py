@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0008_label_note_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='note',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
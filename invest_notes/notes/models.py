@@ -1,8 +1,16 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
-from django.db.models import UniqueConstraint
-from django.db.models.functions import Lower
+from django.db.models import F, Q, UniqueConstraint
+from django.db.models.functions import Lower, Upper
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from .validators import validate_title
+from .versions import LABELS, NOTES, bump_data_version
+
+# Конфигурация полнотекстового поиска: заметки в основном на русском.
+SEARCH_CONFIG = 'russian'
 
 
 class User(AbstractUser):
@@ -10,6 +18,28 @@ class User(AbstractUser):
                               help_text='введите email')
 
 
+class OwnedQuerySet(models.QuerySet):
+    """
+    Удаление меняет версии данных (notes.versions) один раз на
+    владельца, а не сигналом post_delete на каждую строку: без
+    получателей сигналов Collector не загружает удаляемые строки
+    целиком, а связи заметок с метками удаляет одним запросом.
+    """
+    owner_field = 'owner'
+
+    def delete(self):
+        owners = set(self.order_by().values_list(
+            f'{self.owner_field}_id', flat=True).distinct())
+        result = super().delete()
+        for owner_id in owners:
+            bump_data_version(owner_id, LABELS, NOTES)
+        return result
+
+
+class NoteQuerySet(OwnedQuerySet):
+    owner_field = 'author'
+
+
 class Label(models.Model):
     owner = models.ForeignKey(User, verbose_name='владелец метки',
                               on_delete=models.CASCADE, related_name='labels')
@@ -18,32 +48,107 @@ class Label(models.Model):
                              help_text='название метки',
                              validators=[validate_title,])
     created_at = models.DateTimeField(auto_now_add=True)
+    # Число заметок с меткой ведут триггеры БД (миграция 0008),
+    # save() метки его не перезаписывает.
+    note_count = models.IntegerField(db_default=0, editable=False,
+                                     verbose_name='Заметок с меткой')
+
+    objects = OwnedQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'метка'
         verbose_name_plural = 'Метки'
-        ordering = ('title',)
+        ordering = ('title', 'id')
         constraints = [UniqueConstraint(Lower('title'), 'owner',
                        name='unique_label_per_user_case_insensitive'),]
-        indexes = [models.Index(fields=['owner'])]
+        indexes = [
+            models.Index(fields=['owner', 'title', 'id']),
+            models.Index(fields=['owner', 'note_count', 'id'],
+                         name='label_owner_note_count'),
+            GinIndex(F('owner'), OpClass(Upper('title'), name='gin_trgm_ops'),
+                     name='label_owner_title_trgm'),
+        ]
 
     def __str__(self):
         return f'Метка "{self.title}" от пользователя {self.owner.username}'
 
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_data_version(self.owner_id, LABELS, NOTES)
+        return result
+
 
 class Note(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     labels = models.ManyToManyField(Label)
 
     text = models.TextField(verbose_name='Текст', help_text='Текст заметки')
-    created_at = models.DateTimeField(auto_now_add=True)
+    # default вместо auto_now_add: импорт сохраняет исходную дату.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Копия labels, которую ведут триггеры БД (миграция 0006):
+    # фильтр по меткам — один поиск по GIN-индексу без JOIN.
+    label_ids = ArrayField(models.BigIntegerField(), default=list,
+                           editable=False, verbose_name='ID меток')
+    search_vector = models.GeneratedField(
+        expression=SearchVector('text', config=SEARCH_CONFIG),
+        output_field=SearchVectorField(), db_persist=True)
+
+    objects = NoteQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'заметка'
         verbose_name_plural = 'Заметки'
         default_related_name = 'notes'
-        indexes = [models.Index(fields=['author', 'created_at'])]
+        indexes = [
+            models.Index(fields=['author', 'created_at']),
+            GinIndex(fields=['author', 'label_ids'],
+                     name='note_author_label_ids'),
+            GinIndex(fields=['author', 'search_vector'],
+                     name='note_author_search_vector'),
+            GinIndex(F('author'), OpClass(Upper('text'), name='gin_trgm_ops'),
+                     name='note_author_text_trgm'),
+        ]
 
     def __str__(self):
         return (f'Заметка от пользователя {self.author.username}'
                 f': {self.text[:10]}...')
+
+    def delete(self, *args, **kwargs):
+        """Удаление заметки меняет Label.note_count её меток."""
+        result = super().delete(*args, **kwargs)
+        bump_data_version(self.author_id, LABELS, NOTES)
+        return result
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди на отправку (см. notes.mail.OutboxEmailBackend)."""
+    subject = models.TextField(verbose_name='Тема')
+    body = models.TextField(verbose_name='Текст')
+    html_body = models.TextField(blank=True, verbose_name='HTML')
+    from_email = models.CharField(max_length=254,
+                                  verbose_name='Отправитель')
+    to = models.JSONField(default=list, verbose_name='Получатели')
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    scheduled_at = models.DateTimeField(default=timezone.now,
+                                        verbose_name='Следующая попытка')
+    sent_at = models.DateTimeField(null=True, blank=True,
+                                   verbose_name='Отправлено')
+    attempts = models.PositiveSmallIntegerField(default=0,
+                                                verbose_name='Попытки')
+    last_error = models.TextField(blank=True,
+                                  verbose_name='Последняя ошибка')
+
+    class Meta:
+        verbose_name = 'исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        ordering = ('scheduled_at', 'id')
+        indexes = [models.Index(fields=['scheduled_at', 'id'],
+                                condition=Q(sent_at__isnull=True),
+                                name='outgoing_email_pending')]
+
+    def __str__(self):
+        return f'Письмо "{self.subject}" для {", ".join(self.to)}'
@@ -0,0 +1,205 @@
+import base64
+import binascii
+import json
+import operator
+from collections import namedtuple
+from datetime import datetime
+from functools import reduce
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Field, Func, Q, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+Cursor = namedtuple('Cursor', ['reverse', 'position'])
+
+
+def row(*expressions):
+    return Func(*expressions, function='ROW', output_field=Field())
+
+
+def filter_after(queryset, ordering, position):
+    """
+    Строки строго после position в порядке ordering. Если все поля
+    сортируются в одну сторону, это одно сравнение строк
+    ROW(a, b) > ROW(x, y), которое индекс по (a, b) обслуживает как
+    границу диапазона; иначе — равносильная цепочка условий через OR.
+    """
+    names = [field.lstrip('-') for field in ordering]
+    descending = {field.startswith('-') for field in ordering}
+    if len(descending) == 1:
+        lookup = 'lt' if descending.pop() else 'gt'
+        return queryset.alias(keyset=row(*map(F, names))).filter(**{
+            f'keyset__{lookup}': row(*map(Value, position))})
+    conditions = []
+    for index, field in enumerate(ordering):
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        conditions.append(Q(**dict(zip(names[:index], position)),
+                            **{f'{names[index]}__{lookup}': position[index]}))
+    return queryset.filter(reduce(operator.or_, conditions))
+
+
+def page_queryset(queryset, ordering, cursor, page_size):
+    """
+    Запрос страницы после позиции курсора (или перед ней для
+    обратного курсора): на одну строку больше page_size, чтобы
+    узнать, есть ли строки дальше.
+    """
+    reverse, position = cursor or Cursor(False, None)
+    if reverse:
+        ordering = _reverse_ordering(ordering)
+    queryset = queryset.order_by(*ordering)
+    if position is not None:
+        queryset = filter_after(queryset, ordering, position)
+    return queryset[:page_size + 1]
+
+
+def split_page(results, cursor, page_size):
+    """(строки страницы, есть ли следующая, есть ли предыдущая)."""
+    reverse, position = cursor or Cursor(False, None)
+    page = list(results[:page_size])
+    has_more = len(results) > page_size
+    if reverse:
+        page.reverse()
+        return page, True, has_more
+    return page, has_more, position is not None
+
+
+def get_position(ordering, row):
+    names = (field.lstrip('-') for field in ordering)
+    if isinstance(row, dict):
+        return [row[name] for name in names]
+    return [getattr(row, name) for name in names]
+
+
+def encode_cursor(ordering, cursor):
+    position = [value.isoformat() if isinstance(value, datetime)
+                else value for value in cursor.position]
+    data = json.dumps({'o': ordering, 'r': cursor.reverse, 'p': position},
+                      separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(encoded, ordering, queryset):
+    """
+    Курсор действителен только для того порядка, в котором выдан;
+    значения позиции приводятся к типам полей сортировки.
+    ValueError — курсор недействителен.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(encoded))
+        if tuple(data['o']) != tuple(ordering):
+            raise ValueError
+        fields = [get_ordering_field(queryset, field.lstrip('-'))
+                  for field in ordering]
+        position = [field.to_python(value)
+                    for field, value in zip(fields, data['p'], strict=True)]
+        return Cursor(bool(data['r']), position)
+    except (ValueError, TypeError, KeyError, binascii.Error,
+            FieldDoesNotExist, ValidationError):
+        raise ValueError('Invalid cursor')
+
+
+def get_ordering_field(queryset, name):
+    annotation = queryset.query.annotations.get(name)
+    if annotation is not None:
+        return annotation.output_field
+    return queryset.model._meta.get_field(name)
+
+
+def get_page_links(url, ordering, cursor, page, has_next, has_previous,
+                   cursor_query_param='cursor'):
+    """Ссылки next и previous страницы page, url — адрес запроса."""
+    next_link = previous_link = None
+    if has_next:
+        if page:
+            next_link = replace_query_param(
+                url, cursor_query_param, encode_cursor(
+                    ordering, Cursor(False, get_position(ordering,
+                                                         page[-1]))))
+        else:
+            # Перед обратным курсором ничего нет: дальше — первая страница.
+            next_link = remove_query_param(url, cursor_query_param)
+    if has_previous and page:
+        previous_link = replace_query_param(
+            url, cursor_query_param, encode_cursor(
+                ordering, Cursor(True, get_position(ordering, page[0]))))
+    return next_link, previous_link
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Постраничная выдача по ключу (keyset): курсор хранит значения
+    всех полей сортировки крайней строки страницы, и соседняя страница
+    выбирается сравнением с ними, а не OFFSET. Глубокие страницы стоят
+    столько же, сколько первая, а одинаковые значения первого поля
+    (rank, note_count) не требуют смещения и не зацикливают выдачу.
+    """
+    page_size = settings.API_PAGE_SIZE
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request, queryset)
+        results = list(page_queryset(queryset, self.ordering, self.cursor,
+                                     self.page_size))
+        self.page, self.has_next, self.has_previous = split_page(
+            results, self.cursor, self.page_size)
+        self.next_link, self.previous_link = get_page_links(
+            self.base_url, self.ordering, self.cursor, self.page,
+            self.has_next, self.has_previous, self.cursor_query_param)
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Порядок задаёт первый фильтр, у которого он есть для этого
+        запроса; CursorPagination спрашивает только первый фильтр
+        с get_ordering, даже если тот ничего не вернул.
+        """
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return tuple(ordering)
+        return tuple(self.ordering)
+
+    def get_next_link(self):
+        return self.next_link
+
+    def get_previous_link(self):
+        return self.previous_link
+
+    def decode_cursor(self, request, queryset=None):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            return decode_cursor(encoded, self.ordering, queryset)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+
+class LabelPagination(KeysetPagination):
+    """
+    Метки владельца упорядочены по title, затем по id; запрос
+    обслуживается индексом (owner, title, id), при сортировке по
+    числу заметок — индексом (owner, note_count, id).
+    """
+    ordering = ('title', 'id')
+
+
+class NotePagination(KeysetPagination):
+    """Заметки автора от новых к старым по индексу (author, created_at)."""
+    ordering = ('-created_at', '-id')
@@ -4,5 +4,10 @@ from rest_framework.permissions import BasePermission, IsAuthenticated
 class IsAuthor(IsAuthenticated):
 
     def has_object_permission(self, request, view, obj):
-        """Доступ только владельцу объекта."""
-        return request.user == obj.owner and request.user.is_authenticated
+        """
+        Доступ только владельцу объекта. Сравниваются id внешнего
+        ключа (owner_id), связанный пользователь из БД не загружается.
+        """
+        owner_field = getattr(view, 'owner_field', 'owner')
+        return (request.user.is_authenticated
+                and getattr(obj, f'{owner_field}_id') == request.user.id)
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                  if orjson else 0)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Компактный UTF-8 JSON через orjson. Типы, которых orjson не знает,
+    и даты кодирует JSONEncoder DRF, поэтому вывод совпадает
+    с JSONRenderer. Без orjson и для вывода с отступами (browsable
+    API) работает JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {})):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        content = orjson.dumps(data, default=JSONEncoder().default,
+                               option=ORJSON_OPTIONS)
+        # Как JSONRenderer: U+2028 и U+2029 недопустимы в JavaScript.
+        if b'\xe2\x80' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028')
+            content = content.replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    JSON Lines. Экспорт отдаёт StreamingHttpResponse сам, рендерер
+    нужен для согласования формата и для ответов с ошибками.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        records = data if isinstance(data, list) else [data]
+        return ''.join(json.dumps(record, ensure_ascii=False) + '\n'
+                       for record in records).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """CSV; ответ с ошибкой — строки «поле, сообщение»."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        items = data.items() if isinstance(data, dict) else enumerate(data)
+        for key, value in items:
+            writer.writerow([key, value])
+        return buffer.getvalue().encode(self.charset)
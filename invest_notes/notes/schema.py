@@ -0,0 +1,105 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+from drf_yasg import openapi
+from drf_yasg.app_settings import swagger_settings
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.renderers import OpenAPIRenderer, SwaggerJSONRenderer
+
+from .renderers import ORJSON_OPTIONS, orjson
+
+API_INFO = openapi.Info(
+    title="Snippets API",
+    default_version='v1',
+    description="Invest Notes Discription",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="morozov460336@yandex.ru"),
+    license=openapi.License(name="BSD License"),
+)
+
+
+class FastOpenAPICodecJson(OpenAPICodecJson):
+    """Компактная схема через orjson; с отступами — стандартный кодек."""
+
+    def _dump_dict(self, spec):
+        if orjson is None or self.pretty:
+            return super()._dump_dict(spec)
+        return orjson.dumps(spec, option=ORJSON_OPTIONS)
+
+
+class FastSwaggerJSONRenderer(SwaggerJSONRenderer):
+    codec_class = FastOpenAPICodecJson
+
+
+class FastOpenAPIRenderer(OpenAPIRenderer):
+    codec_class = FastOpenAPICodecJson
+
+
+def generate_schema():
+    """Публичная OpenAPI-схема всего API в виде JSON (bytes)."""
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(API_INFO)
+    schema = generator.get_schema(request=None, public=True)
+    return FastOpenAPICodecJson(validators=[]).encode(schema)
+
+
+@dataclass(frozen=True)
+class StaticSchema:
+    source: tuple
+    content: bytes
+    etag: str
+    last_modified: object
+
+
+_static_schema = None
+_static_schema_lock = threading.Lock()
+
+
+def get_static_schema():
+    """
+    Схема из файла API_SCHEMA_FILE (manage.py generate_schema).
+    Файл перечитывается только при изменении mtime; если файла нет,
+    схема генерируется один раз при первом обращении.
+    """
+    global _static_schema
+    path = Path(settings.API_SCHEMA_FILE)
+    try:
+        source = (path, path.stat().st_mtime)
+    except FileNotFoundError:
+        source = (path, None)
+
+    schema = _static_schema
+    if schema is not None and schema.source == source:
+        return schema
+    with _static_schema_lock:
+        if _static_schema is None or _static_schema.source != source:
+            if source[1] is None:
+                content = generate_schema()
+                last_modified = timezone.now()
+            else:
+                content = path.read_bytes()
+                last_modified = datetime.fromtimestamp(source[1],
+                                                       tz=dt_timezone.utc)
+            _static_schema = StaticSchema(
+                source=source, content=content,
+                etag=f'"{hashlib.sha256(content).hexdigest()[:32]}"',
+                last_modified=last_modified)
+        return _static_schema
+
+
+@require_safe
+@condition(
+    etag_func=lambda request: get_static_schema().etag,
+    last_modified_func=lambda request: get_static_schema().last_modified)
+def static_schema_view(request):
+    schema = get_static_schema()
+    response = HttpResponse(schema.content, content_type='application/json')
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
@@ -1,11 +1,30 @@
 from djoser.serializers import UserCreatePasswordRetypeSerializer
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
-from .models import Label
+from .models import Label, Note
+from .timing import TimedDataMixin, timed
+from .versions import LABELS, NOTES, bump_data_version
+from .validators import validate_title
 
 User = get_user_model()
 
+LABEL_TITLE_CONSTRAINT = 'unique_label_per_user_case_insensitive'
+LABEL_TITLE_EXISTS = 'You have already created a label with this name.'
+
+
+def is_label_title_conflict(exc):
+    """IntegrityError вызван нарушением уникальности названия метки."""
+    diag = getattr(exc.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == LABEL_TITLE_CONSTRAINT
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
 
 class CustomUserCreateSerializer(UserCreatePasswordRetypeSerializer):
 
@@ -20,11 +39,12 @@ class CustomUserCreateSerializer(UserCreatePasswordRetypeSerializer):
         fields = ('username', 'email', 'password')
 
 
-class LabelSerializer(serializers.ModelSerializer):
+class LabelSerializer(TimedDataMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Label
-        fields = ('id', 'title')
+        fields = ('id', 'title', 'note_count')
+        list_serializer_class = TimedListSerializer
 
     def validate_title(self, value):
 
@@ -34,18 +54,227 @@ class LabelSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Cannot pass an empty value'
             )
+        return value
+
+    def create(self, validated_data):
+        return self.save_unique_title(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self.save_unique_title(super().update, instance,
+                                      validated_data)
+
+    def save_unique_title(self, save, *args):
+        """
+        Уникальность названия проверяет ограничение
+        unique_label_per_user_case_insensitive, а не отдельный SELECT.
+        В режиме autocommit запись идёт одним запросом; внутри
+        транзакции нужна точка сохранения, чтобы пережить ошибку.
+        """
+        try:
+            if connection.in_atomic_block:
+                with transaction.atomic():
+                    return save(*args)
+            return save(*args)
+        except IntegrityError as exc:
+            if not is_label_title_conflict(exc):
+                raise
+            raise serializers.ValidationError({'title': [LABEL_TITLE_EXISTS]})
+
 
+class LabelBulkListSerializer(TimedListSerializer):
+    """
+    Пакетное создание, переименование и удаление меток.
+    Дубликаты проверяются в памяти и одним запросом к БД,
+    запись идёт через bulk_create/bulk_update в одной транзакции.
+    """
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        owner = self.context['request'].user
+
+        ids = {item['id'] for item in items if 'id' in item}
+        titles = {item['title'].lower() for item in items if 'title' in item}
+        existing = list(
+            Label.objects.filter(owner=owner)
+            .annotate(title_lower=Lower('title'))
+            .filter(Q(pk__in=ids) | Q(title_lower__in=titles)))
+        by_id = {label.pk: label for label in existing}
+        by_title = {label.title_lower: label for label in existing}
+        deleted = {item['id'] for item in items
+                   if item['delete'] and item['id'] in by_id}
+
+        errors = []
+        seen_ids = set()
+        seen_titles = set()
+        for item in items:
+            error = {}
+            if 'id' in item:
+                if item['id'] not in by_id:
+                    error['id'] = ['Label not found.']
+                elif item['id'] in seen_ids:
+                    error['id'] = ['Label is referenced more than once.']
+                else:
+                    item['label'] = by_id[item['id']]
+                seen_ids.add(item['id'])
+            if not item['delete']:
+                title = item['title'].lower()
+                label = by_title.get(title)
+                taken = (label is not None and label.pk not in deleted
+                         and label is not item.get('label'))
+                if taken or title in seen_titles:
+                    error['title'] = [LABEL_TITLE_EXISTS]
+                seen_titles.add(title)
+            errors.append(error)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def create(self, validated_data):
         owner = self.context['request'].user
+        deleted = [item['id'] for item in validated_data if item['delete']]
+        renamed = []
+        created = []
+        results = []
+        for item in validated_data:
+            if item['delete']:
+                results.append({'id': item['id'], 'delete': True})
+                continue
+            label = item.get('label')
+            if label is None:
+                label = Label(owner=owner, title=item['title'])
+                created.append(label)
+            else:
+                label.title = item['title']
+                renamed.append(label)
+            results.append(label)
 
-        if self.instance:
-            owner = self.instance.owner
+        try:
+            with transaction.atomic():
+                if deleted:
+                    Label.objects.filter(owner=owner, pk__in=deleted).delete()
+                if renamed:
+                    Label.objects.bulk_update(renamed, ['title'])
+                if created:
+                    Label.objects.bulk_create(created)
+        except IntegrityError as exc:
+            if not is_label_title_conflict(exc):
+                raise
+            raise serializers.ValidationError(LABEL_TITLE_EXISTS)
+        # bulk_update и bulk_create не отправляют сигналы post_save;
+        # удаление меняет версии само (OwnedQuerySet.delete).
+        if renamed or created:
+            bump_data_version(owner.pk, LABELS, NOTES)
+        return results
 
-        label_qs = Label.objects.filter(title__iexact=value, owner=owner)
+    def to_representation(self, data):
+        """
+        Метки — как в ответе LabelSerializer (у созданных note_count 0,
+        у переименованных — сохранённый), удалённые — {"id", "delete"}.
+        """
+        return [item if isinstance(item, dict)
+                else LabelSerializer(item).data for item in data]
 
-        if self.instance:
-            label_qs = label_qs.exclude(pk=self.instance.pk)
 
-        if label_qs.exists():
+class LabelBulkItemSerializer(serializers.Serializer):
+
+    id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=64, required=False)
+    delete = serializers.BooleanField(default=False)
+
+    class Meta:
+        list_serializer_class = LabelBulkListSerializer
+
+    def validate(self, attrs):
+        if attrs['delete']:
+            if 'id' not in attrs:
+                raise serializers.ValidationError(
+                    {'id': ['This field is required.']})
+            attrs.pop('title', None)
+            return attrs
+        if 'title' not in attrs:
             raise serializers.ValidationError(
-                'You have already created a label with this name.')
-        return value
+                {'title': ['This field is required.']})
+        attrs['title'] = validate_title(attrs['title'])
+        return attrs
+
+
+class NoteLabelSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Label
+        fields = ('id', 'title')
+
+
+class NoteSerializer(TimedDataMixin, serializers.ModelSerializer):
+
+    labels = serializers.ListField(child=serializers.IntegerField(),
+                                   required=False, write_only=True)
+
+    class Meta:
+        model = Note
+        fields = ('id', 'text', 'labels', 'created_at')
+        read_only_fields = ('created_at',)
+        list_serializer_class = TimedListSerializer
+
+    def validate_labels(self, value):
+        """Метки заметки проверяются одним запросом."""
+        owner = self.context['request'].user
+        ids = set(value)
+        labels = list(Label.objects.filter(owner=owner, pk__in=ids))
+        if len(labels) != len(ids):
+            unknown = sorted(ids - {label.pk for label in labels})
+            raise serializers.ValidationError(
+                f'Labels {unknown} do not exist.')
+        return labels
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['labels'] = NoteLabelSerializer(instance.labels.all(),
+                                             many=True).data
+        if hasattr(instance, 'headline'):
+            data['headline'] = instance.headline
+        return data
+
+
+format_datetime = serializers.DateTimeField().to_representation
+
+
+def represent_labels(rows, owner_id=None):
+    """
+    Быстрый путь списка меток: строки values('id', 'title', 'note_count')
+    сразу в вывод LabelSerializer, без моделей и полей сериализатора.
+    owner_id не нужен: строки уже отобраны по владельцу.
+    """
+    with timed('serialize'):
+        return [{'id': row['id'], 'title': row['title'],
+                 'note_count': row['note_count']} for row in rows]
+
+
+def represent_notes(rows, owner_id):
+    """
+    Быстрый путь списка заметок по строкам values() с label_ids.
+    Метки всей страницы читаются одним запросом, уже упорядоченными
+    как в NoteSerializer: по title в сортировке базы, затем по id.
+    Метки заметки расставляются по позиции в этом порядке.
+    """
+    ids = {pk for row in rows for pk in row['label_ids']}
+    labels = {pk: (position, title) for position, (pk, title) in enumerate(
+        Label.objects.filter(owner_id=owner_id, pk__in=ids)
+        .order_by('title', 'id').values_list('id', 'title'))} if ids else {}
+    with timed('serialize'):
+        notes = []
+        for row in rows:
+            note = {
+                'id': row['id'],
+                'text': row['text'],
+                'created_at': format_datetime(row['created_at']),
+                'labels': [
+                    {'id': pk, 'title': labels[pk][1]} for pk in sorted(
+                        (pk for pk in row['label_ids'] if pk in labels),
+                        key=labels.get)],
+            }
+            if 'headline' in row:
+                note['headline'] = row['headline']
+            notes.append(note)
+        return notes
@@ -0,0 +1,37 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .authentication import invalidate_user_cache
+from .models import Label, Note, User
+from .versions import LABELS, NOTES, bump_data_version
+
+
+@receiver([post_save, post_delete], sender=User)
+def reset_cached_user(sender, instance, **kwargs):
+    """Изменение или удаление пользователя сбрасывает его кэш."""
+    invalidate_user_cache(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Метки и заметки удалены каскадом: версии меняются один раз."""
+    bump_data_version(instance.pk, LABELS, NOTES)
+
+
+# Удаление меток и заметок меняет версии в Label.delete, Note.delete
+# и OwnedQuerySet.delete: получатель post_delete отключил бы быстрое
+# удаление в Collector.
+@receiver(post_save, sender=Label)
+def label_changed(sender, instance, **kwargs):
+    bump_data_version(instance.owner_id, LABELS, NOTES)
+
+
+@receiver(post_save, sender=Note)
+def note_changed(sender, instance, **kwargs):
+    bump_data_version(instance.author_id, NOTES)
+
+
+@receiver(m2m_changed, sender=Note.labels.through)
+def note_labels_changed(sender, instance, action, **kwargs):
+    if action.startswith('post_'):
+        bump_data_version(getattr(instance, 'author_id', None)
+                          or instance.owner_id, LABELS, NOTES)
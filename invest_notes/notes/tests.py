@@ -1,11 +1,60 @@
-from rest_framework.test import APITestCase
+import csv
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+import threading
+
+import brotli
+import zstandard
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from rest_framework.test import (APIRequestFactory, APITestCase,
+                                 APITransactionTestCase)
+from rest_framework.request import Request
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.settings import api_settings as jwt_api_settings
+from django.contrib.auth.models import AnonymousUser
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from djoser.utils import encode_uid
 from django.conf import settings
-from notes.models import Label
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.db.models.signals import post_delete, pre_delete
+from django.db import DatabaseError, connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from notes.models import Label, Note, OutgoingEmail
+from notes.views import NoteViewSet
+from notes.pagination import LabelPagination, NotePagination
+from notes.permissions import IsAuthor
+from notes.authentication import user_cache_entry, user_cache_key
+from notes.filters import NoteSearchFilter
+from notes.compression import GzipCodec, choose_codec
+from notes.importer import import_notes
+from notes.middleware import CompressionMiddleware, RequestTimingMiddleware
+from notes import parsers, renderers
+from notes.parsers import FastJSONParser
+from notes.renderers import FastJSONRenderer
+from notes.serializers import (LABEL_TITLE_EXISTS, LabelSerializer,
+                               NoteSerializer)
+from notes.versions import LABELS, NOTES, bump_data_version, get_data_version
+from notes.throttling import AnonFixedWindowThrottle
 
 
 User = get_user_model()
@@ -19,6 +68,12 @@ USER_ME = 'user-me'
 
 LABEL_LIST = 'labels-list'
 LABEL_DETAIL = 'labels-detail'
+LABEL_BULK = 'labels-bulk'
+
+NOTE_LIST = 'notes-list'
+NOTE_DETAIL = 'notes-detail'
+
+SCHEMA_JSON = 'schema-json'
 
 AUTH_PREFIX = settings.SIMPLE_JWT['AUTH_HEADER_TYPES'][0]
 
@@ -428,8 +483,10 @@ class TestCreateLabel(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED,
                          'Авторизованный пользователь не может создать метку')
         self.assertCountEqual(
-            response.data.keys(), ['id', 'title'],
-            'При создании ответ API содержит не только id и title')
+            response.data.keys(), ['id', 'title', 'note_count'],
+            'При создании ответ API содержит не только id, title '
+            'и note_count')
+        self.assertEqual(response.data['note_count'], 0)
         label = Label.objects.get(owner=self.user,
                                   title=self.data_label_1['title'])
         self.assertEqual(response.data['id'], label.id,
@@ -490,3 +547,1962 @@ class TestCreateLabel(APITestCase):
         self.assertEqual(
             response.status_code, status.HTTP_200_OK,
             'Пользователь не может изменить свою метку на такую же')
+
+
+class TestLabelWriteQueries(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_JWT_CREATE = reverse(JWT_CREATE)
+        cls.URL_LABEL_LIST = reverse(LABEL_LIST)
+
+        cls.AUTH_PREFIX = AUTH_PREFIX
+
+        cls.data_user = {
+            "username": "user",
+            "email": "user@test.com",
+            "password": "testpwd123123",
+        }
+        cls.user = User.objects.create_user(
+            username=cls.data_user['username'],
+            password=cls.data_user['password'],
+            email=cls.data_user['email'],
+            is_active=True
+        )
+        cls.label_1 = Label.objects.create(owner=cls.user, title='label_1')
+        cls.label_2 = Label.objects.create(owner=cls.user, title='label_2')
+
+    def setUp(self):
+        response = self.client.post(self.URL_JWT_CREATE, self.data_user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{self.AUTH_PREFIX} {response.data['access']}")
+
+    def label_selects(self, queries):
+        return [query['sql'] for query in queries
+                if query['sql'].startswith('SELECT')
+                and 'FROM "notes_label"' in query['sql']]
+
+    def test_create_without_duplicate_check_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.URL_LABEL_LIST,
+                                        {'title': 'fresh'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.label_selects(queries), [],
+                         'При создании метки выполняется проверочный SELECT')
+        response = self.client.post(self.URL_LABEL_LIST, {'title': 'FRESH'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data,
+            {'title': ['You have already created a label with this name.']})
+
+    def test_patch_to_existing_title(self):
+        url = reverse(LABEL_DETAIL, args=[self.label_1.id])
+        response = self.client.patch(url, {'title': 'LABEL_2'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST,
+                         'Можно переименовать метку в уже существующую')
+        response = self.client.patch(url, {'title': 'LABEL_1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK,
+                         'Нельзя изменить регистр названия своей метки')
+        self.label_1.refresh_from_db()
+        self.assertEqual(self.label_1.title, 'LABEL_1')
+
+
+class TestLabelsPagination(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_JWT_CREATE = reverse(JWT_CREATE)
+        cls.URL_LABEL_LIST = reverse(LABEL_LIST)
+
+        cls.AUTH_PREFIX = AUTH_PREFIX
+
+        cls.data_user = {
+            "username": "user",
+            "email": "user@test.com",
+            "password": "testpwd123123",
+        }
+        cls.user = User.objects.create_user(
+            username=cls.data_user['username'],
+            password=cls.data_user['password'],
+            email=cls.data_user['email'],
+            is_active=True
+        )
+        cls.other_user = User.objects.create_user(
+            username='other', password='testpwd123123',
+            email='other@test.com', is_active=True)
+        cls.titles = ['delta', 'alpha', 'echo', 'charlie', 'bravo']
+        Label.objects.bulk_create(
+            Label(owner=cls.user, title=title) for title in cls.titles)
+        Label.objects.create(owner=cls.other_user, title='aaa')
+
+    def setUp(self):
+        response = self.client.post(self.URL_JWT_CREATE, self.data_user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{self.AUTH_PREFIX} {response.data['access']}")
+
+    def test_pages_follow_title_order(self):
+        url = f'{self.URL_LABEL_LIST}?page_size=2'
+        titles = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2,
+                                 'Страница больше запрошенного размера')
+            titles += [label['title'] for label in response.data['results']]
+            url = response.data['next']
+            pages += 1
+        self.assertEqual(pages, 3, 'Неверное количество страниц')
+        self.assertEqual(titles, sorted(self.titles),
+                         'Метки на страницах идут не по порядку title')
+
+    def test_previous_page(self):
+        response = self.client.get(f'{self.URL_LABEL_LIST}?page_size=2')
+        response = self.client.get(response.data['next'])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [label['title'] for label in response.data['results']],
+            ['alpha', 'bravo'],
+            'Ссылка на предыдущую страницу ведёт не на первую страницу')
+
+    def test_max_page_size(self):
+        with mock.patch.object(LabelPagination, 'max_page_size', 3):
+            response = self.client.get(f'{self.URL_LABEL_LIST}?page_size=100')
+        self.assertEqual(len(response.data['results']), 3,
+                         'Размер страницы не ограничен max_page_size')
+        self.assertIsNotNone(response.data['next'])
+
+
+class TestLabelsSearch(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_JWT_CREATE = reverse(JWT_CREATE)
+        cls.URL_LABEL_LIST = reverse(LABEL_LIST)
+
+        cls.AUTH_PREFIX = AUTH_PREFIX
+
+        cls.data_user = {
+            "username": "user",
+            "email": "user@test.com",
+            "password": "testpwd123123",
+        }
+        cls.user = User.objects.create_user(
+            username=cls.data_user['username'],
+            password=cls.data_user['password'],
+            email=cls.data_user['email'],
+            is_active=True
+        )
+        other_user = User.objects.create_user(
+            username='other', password='testpwd123123',
+            email='other@test.com', is_active=True)
+        Label.objects.bulk_create(
+            Label(owner=cls.user, title=title)
+            for title in ['sberbank', 'zz SBER', 'gazprom', 'Сбер'])
+        Label.objects.create(owner=other_user, title='sber')
+
+    def setUp(self):
+        response = self.client.post(self.URL_JWT_CREATE, self.data_user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{self.AUTH_PREFIX} {response.data['access']}")
+
+    def test_search_is_ranked_and_scoped_by_owner(self):
+        response = self.client.get(self.URL_LABEL_LIST, {'search': 'sber'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [label['title'] for label in response.data['results']],
+            ['zz SBER', 'sberbank'],
+            'Поиск не ранжирует совпадения или возвращает чужие метки')
+
+    def test_search_pages(self):
+        url = f'{self.URL_LABEL_LIST}?search=sber&page_size=1'
+        titles = []
+        while url:
+            response = self.client.get(url)
+            titles += [label['title'] for label in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(titles, ['zz SBER', 'sberbank'],
+                         'Пагинация результатов поиска нарушает порядок')
+
+    def test_search_cyrillic(self):
+        response = self.client.get(self.URL_LABEL_LIST, {'search': 'СБЕР'})
+        self.assertEqual(
+            [label['title'] for label in response.data['results']], ['Сбер'])
+
+    def test_search_pages_with_tied_rank(self):
+        titles = [f'gazprom {i}' for i in range(7)]
+        Label.objects.bulk_create(
+            Label(owner=self.user, title=title) for title in titles)
+        url = f'{self.URL_LABEL_LIST}?search=gazprom&page_size=2'
+        found = []
+        # Старый курсор со смещением внутри равных rank не проходил
+        # дальше offset_cutoff одинаковых значений.
+        with mock.patch.object(LabelPagination, 'offset_cutoff', 2):
+            while url and len(found) < 20:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                found += [label['title'] for label in response.data['results']]
+                url = response.data['next']
+            response = self.client.get(response.data['previous'])
+        self.assertEqual(found, ['gazprom', *titles],
+                         'Метки с равным rank не идут по title, id')
+        self.assertEqual(
+            [label['title'] for label in response.data['results']],
+            titles[3:5], 'Предыдущая страница при равных rank неверна')
+
+
+class TestNotes(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_JWT_CREATE = reverse(JWT_CREATE)
+        cls.URL_NOTE_LIST = reverse(NOTE_LIST)
+
+        cls.AUTH_PREFIX = AUTH_PREFIX
+
+        cls.data_user = {
+            "username": "user",
+            "email": "user@test.com",
+            "password": "testpwd123123",
+        }
+        cls.user = User.objects.create_user(
+            username=cls.data_user['username'],
+            password=cls.data_user['password'],
+            email=cls.data_user['email'],
+            is_active=True
+        )
+        cls.other_user = User.objects.create_user(
+            username='other', password='testpwd123123',
+            email='other@test.com', is_active=True)
+        cls.label_1 = Label.objects.create(owner=cls.user, title='label_1')
+        cls.label_2 = Label.objects.create(owner=cls.user, title='label_2')
+        cls.other_label = Label.objects.create(owner=cls.other_user,
+                                               title='other')
+        cls.other_note = Note.objects.create(author=cls.other_user,
+                                             text='other note')
+
+    def setUp(self):
+        response = self.client.post(self.URL_JWT_CREATE, self.data_user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{self.AUTH_PREFIX} {response.data['access']}")
+
+    def create_notes(self, count):
+        for i in range(count):
+            note = Note.objects.create(author=self.user, text=f'note {i}')
+            note.labels.set([self.label_1, self.label_2])
+
+    def test_can_user_create_note(self):
+        response = self.client.post(
+            self.URL_NOTE_LIST,
+            {'text': 'buy', 'labels': [self.label_2.id, self.label_1.id]},
+            format='json')
+        self.assertEqual(
+            response.status_code, status.HTTP_201_CREATED,
+            'Авторизованный пользователь не может создать заметку')
+        self.assertCountEqual(response.data.keys(),
+                              ['id', 'text', 'labels', 'created_at'])
+        self.assertEqual(
+            response.data['labels'],
+            [{'id': self.label_1.id, 'title': 'label_1'},
+             {'id': self.label_2.id, 'title': 'label_2'}],
+            'Метки заметки выводятся неверно')
+        note = Note.objects.get(pk=response.data['id'])
+        self.assertEqual(note.author, self.user)
+
+    def test_cannot_use_foreign_label(self):
+        response = self.client.post(
+            self.URL_NOTE_LIST,
+            {'text': 'buy', 'labels': [self.other_label.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST,
+                         'Можно привязать к заметке чужую метку')
+
+    def test_list_is_scoped_and_ordered(self):
+        self.create_notes(3)
+        response = self.client.get(self.URL_NOTE_LIST)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [note['text'] for note in response.data['results']],
+            ['note 2', 'note 1', 'note 0'],
+            'Список заметок содержит чужие заметки или идёт не по порядку')
+
+    def test_list_query_count_is_constant(self):
+        self.create_notes(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.URL_NOTE_LIST)
+        self.create_notes(8)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self.URL_NOTE_LIST)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(len(few), len(many),
+                         'Количество запросов растёт вместе с числом заметок')
+
+    def test_patch_and_delete_note(self):
+        self.create_notes(1)
+        note = Note.objects.get(author=self.user)
+        url = reverse(NOTE_DETAIL, args=[note.id])
+        response = self.client.patch(
+            url, {'text': 'sell', 'labels': [self.label_2.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['text'], 'sell')
+        self.assertEqual(response.data['labels'],
+                         [{'id': self.label_2.id, 'title': 'label_2'}])
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Note.objects.filter(pk=note.id).exists())
+
+    def test_foreign_note_not_available(self):
+        url = reverse(NOTE_DETAIL, args=[self.other_note.id])
+        self.assertEqual(self.client.get(url).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(url).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+
+class TestLabelsBulk(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_JWT_CREATE = reverse(JWT_CREATE)
+        cls.URL_LABEL_BULK = reverse(LABEL_BULK)
+
+        cls.AUTH_PREFIX = AUTH_PREFIX
+
+        cls.data_user = {
+            "username": "user",
+            "email": "user@test.com",
+            "password": "testpwd123123",
+        }
+        cls.user = User.objects.create_user(
+            username=cls.data_user['username'],
+            password=cls.data_user['password'],
+            email=cls.data_user['email'],
+            is_active=True
+        )
+        other_user = User.objects.create_user(
+            username='other', password='testpwd123123',
+            email='other@test.com', is_active=True)
+        cls.label_1 = Label.objects.create(owner=cls.user, title='label_1')
+        cls.label_2 = Label.objects.create(owner=cls.user, title='label_2')
+        cls.other_label = Label.objects.create(owner=other_user,
+                                               title='other')
+        Note.objects.create(author=cls.user, text='note').labels.add(
+            cls.label_1)
+
+    def setUp(self):
+        response = self.client.post(self.URL_JWT_CREATE, self.data_user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{self.AUTH_PREFIX} {response.data['access']}")
+
+    def test_bulk_create_update_delete(self):
+        data = [
+            {'title': '  new   label '},
+            {'id': self.label_1.id, 'title': 'LABEL_2'},
+            {'id': self.label_2.id, 'delete': True},
+        ]
+        response = self.client.post(self.URL_LABEL_BULK, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK,
+                         response.data)
+        created = Label.objects.get(owner=self.user, title='new label')
+        self.assertEqual(response.data, [
+            {'id': created.id, 'title': 'new label', 'note_count': 0},
+            {'id': self.label_1.id, 'title': 'LABEL_2', 'note_count': 1},
+            {'id': self.label_2.id, 'delete': True},
+        ], 'Ответ пакетной операции отличается от ответа LabelSerializer')
+        self.assertCountEqual(
+            Label.objects.filter(owner=self.user).values_list('title',
+                                                              flat=True),
+            ['new label', 'LABEL_2'])
+
+    def test_bulk_reports_item_errors(self):
+        data = [
+            {'title': 'fresh'},
+            {'title': 'Label_1'},
+            {'title': 'FRESH'},
+            {'id': self.other_label.id, 'title': 'stolen'},
+        ]
+        response = self.client.post(self.URL_LABEL_BULK, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data), len(data))
+        self.assertEqual(response.data[0], {})
+        self.assertIn('title', response.data[1],
+                      'Не найден дубликат с существующей меткой')
+        self.assertIn('title', response.data[2],
+                      'Не найден дубликат внутри пакета')
+        self.assertIn('id', response.data[3],
+                      'Можно изменить чужую метку')
+        self.assertFalse(Label.objects.filter(title='fresh').exists(),
+                         'Пакет с ошибками частично записан в БД')
+
+    def test_bulk_empty_title(self):
+        response = self.client.post(self.URL_LABEL_BULK,
+                                    [{'title': 'fresh'}, {'title': ' '}],
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('title', response.data[1],
+                      'Можно создать пустую метку пакетом')
+
+    def test_bulk_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(self.URL_LABEL_BULK,
+                             [{'title': f'a{i}'} for i in range(2)],
+                             format='json')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.post(
+                self.URL_LABEL_BULK,
+                [{'title': f'b{i}'} for i in range(50)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(few), len(many),
+                         'Количество запросов растёт вместе с размером пакета')
+
+
+class TestFixedWindowThrottle(APITestCase):
+
+    class Throttle(AnonFixedWindowThrottle):
+        rate = '2/min'
+
+    def setUp(self):
+        cache.clear()
+        self.request = Request(APIRequestFactory().get('/'))
+        self.request.user = AnonymousUser()
+
+    def allow(self, now):
+        throttle = self.Throttle()
+        throttle.timer = lambda: now
+        return throttle.allow_request(self.request, None), throttle
+
+    def test_limit_per_window(self):
+        self.assertTrue(self.allow(60)[0])
+        self.assertTrue(self.allow(70)[0])
+        allowed, throttle = self.allow(100)
+        self.assertFalse(allowed, 'Лимит запросов не соблюдается')
+        self.assertEqual(throttle.wait(), 20)
+        self.assertTrue(self.allow(120)[0],
+                        'Лимит не сбрасывается в новом окне')
+
+    async def test_async_shares_window(self):
+        throttle = self.Throttle()
+        throttle.timer = lambda: 60
+        self.assertTrue(await throttle.aallow_request(self.request, None))
+        self.assertTrue(self.allow(70)[0])
+        self.assertFalse(await throttle.aallow_request(self.request, None),
+                         'Асинхронная проверка не учитывает общий счётчик')
+        self.assertEqual(throttle.wait(), 60)
+
+    def test_counter_is_compact(self):
+        _, throttle = self.allow(60)
+        self.allow(61)
+        self.assertEqual(cache.get(f'{throttle.key}:1'), 2,
+                         'В кэше хранится не счётчик запросов')
+
+
+class TestCachedJWTUser(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_JWT_CREATE = reverse(JWT_CREATE)
+        cls.URL_LABEL_LIST = reverse(LABEL_LIST)
+        cls.URL_USER_ME = reverse(USER_ME)
+
+        cls.AUTH_PREFIX = AUTH_PREFIX
+
+        cls.data_user = {
+            "username": "user",
+            "email": "user@test.com",
+            "password": "testpwd123123",
+        }
+        cls.user = User.objects.create_user(
+            username=cls.data_user['username'],
+            password=cls.data_user['password'],
+            email=cls.data_user['email'],
+            is_active=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        response = self.client.post(self.URL_JWT_CREATE, self.data_user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{self.AUTH_PREFIX} {response.data['access']}")
+
+    def user_selects(self, queries):
+        return [query['sql'] for query in queries
+                if 'FROM "notes_user"' in query['sql']]
+
+    def test_user_is_loaded_once(self):
+        self.client.get(self.URL_LABEL_LIST)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.URL_LABEL_LIST)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user_selects(queries), [],
+                         'Пользователь загружается из БД на каждый запрос')
+
+    def test_cache_holds_no_password_hash(self):
+        self.client.get(self.URL_USER_ME)
+        entry = cache.get(user_cache_key(self.user.pk))
+        self.assertEqual(set(entry), {'id', 'username', 'email', 'is_active',
+                                      'password_md5'})
+        self.assertNotIn(self.user.password, entry.values(),
+                         'Хэш пароля попал в кэш')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.URL_USER_ME)
+        self.assertEqual(response.data['email'], self.data_user['email'])
+        self.assertEqual(self.user_selects(queries), [])
+
+    def test_password_change_revokes_cached_user(self):
+        with mock.patch.object(jwt_api_settings, 'CHECK_REVOKE_TOKEN', True):
+            response = self.client.post(self.URL_JWT_CREATE, self.data_user)
+            self.client.credentials(HTTP_AUTHORIZATION=(
+                f"{self.AUTH_PREFIX} {response.data['access']}"))
+            response = self.client.get(self.URL_LABEL_LIST)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # update() не отправляет сигналы: кэш остаётся прежним.
+            User.objects.filter(pk=self.user.pk).update(password='changed')
+            cache.set(user_cache_key(self.user.pk), user_cache_entry(
+                User.objects.get(pk=self.user.pk)))
+            response = self.client.get(self.URL_LABEL_LIST)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED,
+                         'Токен после смены пароля принят')
+
+    def test_deactivation_resets_cache(self):
+        self.client.get(self.URL_LABEL_LIST)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.URL_LABEL_LIST)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED,
+                         'Деактивированный пользователь остаётся в кэше')
+
+    def test_email_change_resets_cache(self):
+        self.client.get(self.URL_USER_ME)
+        response = self.client.patch(self.URL_USER_ME,
+                                     {'email': 'new@test.com'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.URL_USER_ME)
+        self.assertEqual(
+            response.status_code, status.HTTP_401_UNAUTHORIZED,
+            'После смены email и деактивации пользователь остаётся в кэше')
+
+
+class TestStaticSchema(APITestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.schema_file = Path(self.tmp_dir.name) / 'swagger.json'
+        self.url = reverse(SCHEMA_JSON, kwargs={'format': 'json'})
+        static = override_settings(API_SCHEMA_STATIC=True,
+                                   API_SCHEMA_FILE=self.schema_file)
+        static.enable()
+        self.addCleanup(static.disable)
+
+    def generate_schema(self):
+        out = io.StringIO()
+        call_command('generate_schema', stdout=out)
+        self.assertIn(f'Схема записана в {self.schema_file}', out.getvalue(),
+                      'Команда не сообщает, куда записана схема')
+
+    def test_generate_schema_command(self):
+        self.generate_schema()
+        self.assertIn(b'/notes/', self.schema_file.read_bytes(),
+                      'Схема не содержит эндпоинтов API')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.schema_file.read_bytes(),
+                         'Отдаётся не сгенерированный файл схемы')
+        self.assertIn('ETag', response.headers)
+        self.assertIn('Last-Modified', response.headers)
+
+    def test_conditional_requests(self):
+        self.generate_schema()
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED,
+                         'Схема не поддерживает If-None-Match')
+        response = self.client.get(
+            self.url,
+            HTTP_IF_MODIFIED_SINCE=response.headers['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED,
+                         'Схема не поддерживает If-Modified-Since')
+
+        self.schema_file.write_bytes(b'{}')
+        os.utime(self.schema_file, (0, 0))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK,
+                         'Изменённый файл схемы не перечитывается')
+        self.assertEqual(response.content, b'{}')
+
+    def test_schema_without_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'/notes/', response.content)
+
+    @override_settings(API_SCHEMA_STATIC=False)
+    def test_dynamic_schema(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'/notes/', response.content)
+
+
+@override_settings(
+    EMAIL_BACKEND='notes.mail.OutboxEmailBackend',
+    EMAIL_OUTBOX_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class TestEmailOutbox(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_USER_LIST = reverse(USER_LIST)
+
+        cls.data_signup = {
+            "username": "user1",
+            "email": "user1@test.com",
+            "password": "testpwd123123",
+            "re_password": "testpwd123123"
+        }
+
+    def send_queued_mail(self, processed):
+        out = io.StringIO()
+        call_command('send_queued_mail', stdout=out)
+        self.assertIn(f'Всего обработано: {processed}', out.getvalue(),
+                      'Команда сообщает неверное число обработанных писем')
+
+    def test_activation_email_is_queued(self):
+        response = self.client.post(self.URL_USER_LIST, self.data_signup,
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 0,
+                         'Письмо активации отправляется в запросе')
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.to, [self.data_signup['email']])
+        self.assertIsNone(email.sent_at)
+
+        self.send_queued_mail(1)
+        self.assertEqual(len(mail.outbox), 1,
+                         'Воркер не отправил письмо из очереди')
+        self.assertEqual(mail.outbox[0].to, [self.data_signup['email']])
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        email.refresh_from_db()
+        self.assertIsNotNone(email.sent_at)
+        self.assertEqual(email.attempts, 1)
+
+        self.send_queued_mail(0)
+        self.assertEqual(len(mail.outbox), 1,
+                         'Отправленное письмо отправляется повторно')
+
+    def test_failed_delivery_is_retried(self):
+        self.client.post(self.URL_USER_LIST, self.data_signup, format='json')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.'
+                        'send_messages', side_effect=OSError('smtp down')):
+            self.send_queued_mail(1)
+        email = OutgoingEmail.objects.get()
+        self.assertIsNone(email.sent_at)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('smtp down', email.last_error)
+
+        self.send_queued_mail(0)
+        self.assertEqual(len(mail.outbox), 0,
+                         'Письмо повторяется раньше назначенного времени')
+        OutgoingEmail.objects.update(scheduled_at=email.created_at)
+        self.send_queued_mail(1)
+        email.refresh_from_db()
+        self.assertIsNotNone(email.sent_at,
+                             'Письмо не отправляется после ошибки')
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@override_settings(REQUEST_TIMING=True, REQUEST_TIMING_DUPLICATE_THRESHOLD=3)
+class TestRequestTiming(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_NOTE_LIST = reverse(NOTE_LIST)
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        label = Label.objects.create(owner=cls.user, title='label')
+        for i in range(5):
+            note = Note.objects.create(author=cls.user, text=f'note {i}')
+            note.labels.add(label)
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.auth = f"{AUTH_PREFIX} {response.data['access']}"
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+
+    def test_server_timing_header(self):
+        self.client.get(self.URL_NOTE_LIST)
+        with self.assertLogs('notes.timing', 'INFO') as logs:
+            response = self.client.get(self.URL_NOTE_LIST)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = {item.split(';')[0]: item
+                   for item in response['Server-Timing'].split(', ')}
+        self.assertEqual(set(metrics), {'db', 'auth', 'serialize', 'total'})
+        self.assertIn('desc="2 queries"', metrics['db'])
+        self.assertIn('"queries": 2', logs.output[-1])
+        self.assertNotIn('WARNING', ''.join(logs.output),
+                         'Список заметок помечен как N+1')
+
+    async def test_async(self):
+        self.assertTrue(iscoroutinefunction(
+            RequestTimingMiddleware(mock.AsyncMock())))
+        response = await self.async_client.get(
+            reverse('async-labels-list'),
+            headers={'Authorization': self.auth})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = {item.split(';')[0]: item
+                   for item in response['Server-Timing'].split(', ')}
+        self.assertIn('desc="2 queries"', metrics['db'],
+                      'Запросы асинхронного view не учтены')
+        self.assertIn('auth', metrics,
+                      'Аутентификация асинхронного view не замерена')
+
+    def test_duplicate_queries_are_reported(self):
+        def represent_rows(rows, owner_id):
+            return [{'text': Note.objects.get(pk=row['id']).text}
+                    for row in rows]
+
+        with mock.patch.object(NoteViewSet, 'represent_rows',
+                               staticmethod(represent_rows)):
+            with self.assertLogs('notes.timing', 'WARNING') as logs:
+                response = self.client.get(self.URL_NOTE_LIST)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('N+1', logs.output[0])
+        self.assertIn('5 x', logs.output[0])
+
+    def test_disabled(self):
+        with override_settings(REQUEST_TIMING=False):
+            client = self.client_class()
+            client.force_authenticate(self.user)
+            response = client.get(self.URL_NOTE_LIST)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Server-Timing', response,
+                         'Замеры выполняются при выключенном REQUEST_TIMING')
+
+
+class TestConditionalGet(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_LABEL_LIST = reverse(LABEL_LIST)
+        cls.URL_NOTE_LIST = reverse(NOTE_LIST)
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        cls.label = Label.objects.create(owner=cls.user, title='label')
+        cls.note = Note.objects.create(author=cls.user, text='note')
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{AUTH_PREFIX} {response.data['access']}")
+
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED,
+                         'Неизменённый ресурс отдаётся повторно')
+        self.assertEqual(response['ETag'], etag)
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK,
+                         'После изменения данных отдаётся 304')
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_label_list(self):
+        response = self.client.get(self.URL_LABEL_LIST)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertNotModified(self.URL_LABEL_LIST, etag)
+
+        response = self.client.get(self.URL_LABEL_LIST, {'search': 'lab'},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK,
+                         'ETag не зависит от параметров запроса')
+
+        self.client.post(self.URL_LABEL_LIST, {'title': 'new'})
+        etag = self.assertModified(self.URL_LABEL_LIST, etag)
+        self.client.post(reverse(LABEL_BULK), [{'title': 'bulk'}],
+                         format='json')
+        self.assertModified(self.URL_LABEL_LIST, etag)
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.URL_NOTE_LIST)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.URL_NOTE_LIST,
+                HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_note_detail(self):
+        url = reverse(NOTE_DETAIL, args=[self.note.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        self.note.labels.add(self.label)
+        etag = self.assertModified(url, etag)
+        self.client.patch(reverse(LABEL_DETAIL, args=[self.label.pk]),
+                          {'title': 'renamed'})
+        self.assertModified(url, etag)
+
+    def test_other_user_version(self):
+        etag = self.client.get(self.URL_NOTE_LIST)['ETag']
+        other = User.objects.create_user(
+            username='other', password='testpwd123123',
+            email='other@test.com', is_active=True)
+        Label.objects.create(owner=other, title='other')
+        self.assertNotModified(self.URL_NOTE_LIST, etag)
+
+
+class TestAsyncLabels(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_LIST = reverse('async-labels-list')
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        cls.other_user = User.objects.create_user(
+            username='other', password='testpwd123123',
+            email='other@test.com', is_active=True)
+        cls.labels = Label.objects.bulk_create(
+            Label(owner=cls.user, title=f'label {i:02}') for i in range(5))
+        cls.other_label = Label.objects.create(owner=cls.other_user,
+                                               title='other')
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.headers = {
+            'Authorization': f"{AUTH_PREFIX} {response.data['access']}"}
+
+    async def test_list_pages(self):
+        titles = []
+        url = f'{self.URL_LIST}?page_size=2'
+        while url:
+            response = await self.async_client.get(url, headers=self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            titles += [label['title'] for label in data['results']]
+            url = data['next']
+        self.assertEqual(titles, [label.title for label in self.labels],
+                         'Курсор пропускает или повторяет метки')
+
+    async def test_detail(self):
+        label = self.labels[0]
+        response = await self.async_client.get(
+            reverse('async-labels-detail', args=[label.pk]),
+            headers=self.headers)
+        self.assertEqual(response.json(), {'id': label.pk,
+                                           'title': label.title,
+                                           'note_count': 0})
+        response = await self.async_client.get(
+            reverse('async-labels-detail', args=[self.other_label.pk]),
+            headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND,
+                         'Доступна чужая метка')
+
+    async def test_page_links(self):
+        url = f'{self.URL_LIST}?page_size=2'
+        first = (await self.async_client.get(url, headers=self.headers)).json()
+        self.assertEqual(list(first), ['next', 'previous', 'results'],
+                         'Страница отличается от страницы LabelViewSet')
+        self.assertIsNone(first['previous'])
+        second = (await self.async_client.get(
+            first['next'], headers=self.headers)).json()
+        back = (await self.async_client.get(
+            second['previous'], headers=self.headers)).json()
+        self.assertEqual(back['results'], first['results'],
+                         'previous ведёт не на первую страницу')
+        expected = await sync_to_async(self.client.get)(
+            reverse(LABEL_LIST), {'page_size': 2},
+            HTTP_AUTHORIZATION=self.headers['Authorization'])
+        self.assertEqual(first['results'], expected.json()['results'])
+        response = await self.async_client.get(
+            f'{self.URL_LIST}?cursor=bad', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_body_matches_viewset(self):
+        label = await Label.objects.acreate(owner=self.user,
+                                            title='Дивиденды "Сбера"')
+        response = await self.async_client.get(
+            reverse('async-labels-detail', args=[label.pk]),
+            headers=self.headers)
+        expected = await sync_to_async(self.client.get)(
+            reverse(LABEL_DETAIL, args=[label.pk]),
+            HTTP_AUTHORIZATION=self.headers['Authorization'])
+        self.assertEqual(response.content, expected.content,
+                         'Тело ответа отличается от LabelViewSet')
+
+    async def test_create(self):
+        response = await self.async_client.post(
+            self.URL_LIST, {'title': '  new   label '},
+            content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['title'], 'new label')
+        self.assertTrue(await Label.objects.filter(
+            owner=self.user, title='new label').aexists())
+
+        response = await self.async_client.post(
+            self.URL_LIST, {'title': 'LABEL 00'},
+            content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'title': [LABEL_TITLE_EXISTS]})
+
+    async def test_anonymous(self):
+        response = await self.async_client.get(self.URL_LIST)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', response)
+        response = await self.async_client.get(
+            self.URL_LIST, headers={'Authorization': f'{AUTH_PREFIX} bad'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestLabelListCache(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_LABEL_LIST = reverse(LABEL_LIST)
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        cls.label = Label.objects.create(owner=cls.user, title='label')
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{AUTH_PREFIX} {response.data['access']}")
+
+    def titles(self):
+        response = self.client.get(self.URL_LABEL_LIST)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [label['title'] for label in response.data['results']]
+
+    def test_cached_list(self):
+        self.assertEqual(self.titles(), ['label'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(), ['label'],
+                             'Список меток не берётся из кэша')
+
+        response = self.client.get(self.URL_LABEL_LIST, {'search': 'lab'})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_invalidation(self):
+        self.titles()
+        self.client.post(self.URL_LABEL_LIST, {'title': 'new'})
+        self.assertEqual(self.titles(), ['label', 'new'])
+        self.client.patch(reverse(LABEL_DETAIL, args=[self.label.pk]),
+                          {'title': 'renamed'})
+        self.assertEqual(self.titles(), ['new', 'renamed'])
+        self.client.delete(reverse(LABEL_DETAIL, args=[self.label.pk]))
+        self.assertEqual(self.titles(), ['new'])
+        self.client.post(reverse(LABEL_BULK), [{'title': 'bulk'}],
+                         format='json')
+        self.assertEqual(self.titles(), ['bulk', 'new'])
+
+    def test_user_delete(self):
+        self.titles()
+        user_id = self.user.pk
+        version = get_data_version(user_id, LABELS)
+        self.user.delete()
+        self.assertNotEqual(get_data_version(user_id, LABELS), version,
+                            'Каскадное удаление меток не сбрасывает кэш')
+
+
+class TestNoteLabelIds(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_NOTE_LIST = reverse(NOTE_LIST)
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        cls.label_1, cls.label_2, cls.label_3 = Label.objects.bulk_create(
+            Label(owner=cls.user, title=f'label_{i}') for i in range(1, 4))
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{AUTH_PREFIX} {response.data['access']}")
+
+    def label_ids(self, note):
+        return Note.objects.values_list('label_ids', flat=True).get(
+            pk=note.pk)
+
+    def test_triggers(self):
+        note = Note.objects.create(author=self.user, text='note')
+        self.assertEqual(self.label_ids(note), [])
+        note.labels.set([self.label_2, self.label_1])
+        self.assertEqual(self.label_ids(note),
+                         [self.label_1.pk, self.label_2.pk])
+        note.labels.remove(self.label_1)
+        self.assertEqual(self.label_ids(note), [self.label_2.pk])
+
+        note.text = 'changed'
+        note.save()
+        self.assertEqual(self.label_ids(note), [self.label_2.pk],
+                         'save() перезаписывает label_ids')
+
+        self.label_2.delete()
+        self.assertEqual(self.label_ids(note), [],
+                         'Удаление метки не обновляет label_ids')
+
+    def test_filters(self):
+        note_12 = Note.objects.create(author=self.user, text='1 2')
+        note_12.labels.set([self.label_1, self.label_2])
+        note_2 = Note.objects.create(author=self.user, text='2')
+        note_2.labels.set([self.label_2])
+        Note.objects.create(author=self.user, text='none')
+
+        def ids(**params):
+            response = self.client.get(self.URL_NOTE_LIST, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return {note['id'] for note in response.data['results']}
+
+        self.assertEqual(
+            ids(labels=f'{self.label_1.pk},{self.label_2.pk}'), {note_12.pk},
+            'Фильтр labels должен требовать все метки')
+        self.assertEqual(ids(labels=self.label_2.pk), {note_12.pk, note_2.pk})
+        self.assertEqual(
+            ids(labels_any=f'{self.label_1.pk},{self.label_3.pk}'),
+            {note_12.pk}, 'Фильтр labels_any должен требовать одну из меток')
+
+        response = self.client.get(self.URL_NOTE_LIST, {'labels': 'a,1'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestNotesSearch(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_NOTE_LIST = reverse(NOTE_LIST)
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        cls.other_user = User.objects.create_user(
+            username='other', password='testpwd123123',
+            email='other@test.com', is_active=True)
+        cls.dividends = Note.objects.create(
+            author=cls.user,
+            text='Сбербанк объявил дивиденды, дивидендная доходность 11%')
+        cls.report = Note.objects.create(
+            author=cls.user, text='Отчёт Сбербанка по МСФО за квартал')
+        cls.ticker = Note.objects.create(
+            author=cls.user, text='Докупил GAZP и SBERP на просадке')
+        Note.objects.create(author=cls.other_user,
+                            text='Чужая заметка про Сбербанк')
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{AUTH_PREFIX} {response.data['access']}")
+
+    def search(self, query):
+        response = self.client.get(self.URL_NOTE_LIST, {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def test_russian_morphology(self):
+        results = self.search('сбербанк')
+        self.assertEqual({note['id'] for note in results},
+                         {self.dividends.pk, self.report.pk},
+                         'Поиск не учитывает словоформы или автора')
+
+    def test_ranking_and_headline(self):
+        results = self.search('дивиденды')
+        self.assertEqual(results[0]['id'], self.dividends.pk)
+        self.assertIn('<mark>дивиденды</mark>', results[0]['headline'])
+
+        results = self.search('сбербанк дивиденды')
+        self.assertEqual([note['id'] for note in results],
+                         [self.dividends.pk])
+
+    def test_trigram_fallback(self):
+        results = self.search('SBER')
+        self.assertEqual([note['id'] for note in results], [self.ticker.pk],
+                         'Часть тикера не находится')
+
+    def test_pages(self):
+        Note.objects.bulk_create(
+            Note(author=self.user, text=f'дивиденды {i}') for i in range(5))
+        ids = []
+        url = self.URL_NOTE_LIST
+        params = {'search': 'дивиденды', 'page_size': 2}
+        while url:
+            response = self.client.get(url, params)
+            ids += [note['id'] for note in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(len(ids), 6)
+        self.assertEqual(len(set(ids)), 6,
+                         'Курсор повторяет заметки при поиске')
+
+    def test_pages_of_fallback_matches(self):
+        # Заметки, найденные только по icontains, имеют одинаковый rank 0.
+        Note.objects.bulk_create(
+            Note(author=self.user, text=f'Продал SBERP {i}') for i in range(6))
+        expected = list(Note.objects.filter(
+            author=self.user, text__icontains='SBER').order_by(
+                '-created_at', '-id').values_list('id', flat=True))
+        ids = []
+        url = self.URL_NOTE_LIST
+        params = {'search': 'SBER', 'page_size': 2}
+        with mock.patch.object(NotePagination, 'offset_cutoff', 2):
+            while url and len(ids) < 20:
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                ids += [note['id'] for note in response.data['results']]
+                url, params = response.data['next'], None
+        self.assertEqual(ids, expected,
+                         'Курсор теряет или повторяет заметки с rank 0')
+
+
+class TestNotesExport(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_EXPORT = reverse('notes-export')
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        other_user = User.objects.create_user(
+            username='other', password='testpwd123123',
+            email='other@test.com', is_active=True)
+        cls.label_1 = Label.objects.create(owner=cls.user, title='label_1')
+        cls.label_2 = Label.objects.create(owner=cls.user, title='label_2')
+        cls.notes = []
+        for i in range(5):
+            note = Note.objects.create(author=cls.user, text=f'note, "{i}"')
+            note.labels.set([cls.label_1, cls.label_2][:i % 3])
+            cls.notes.append(note)
+        Note.objects.create(author=other_user, text='other')
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{AUTH_PREFIX} {response.data['access']}")
+
+    def export(self, **kwargs):
+        response = self.client.get(self.URL_EXPORT, **kwargs)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming, 'Экспорт не потоковый')
+        with CaptureQueriesContext(connection) as queries:
+            content = b''.join(response.streaming_content).decode()
+        return response, content, queries
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_ndjson(self):
+        response, content, queries = self.export()
+        self.assertEqual(response['Content-Type'],
+                         'application/x-ndjson; charset=utf-8')
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [record['title'] for record in records[:2]],
+            ['label_1', 'label_2'])
+        notes = records[2:]
+        self.assertEqual([note['id'] for note in notes],
+                         [note.pk for note in self.notes],
+                         'Экспортированы не все или чужие заметки')
+        self.assertEqual(notes[2]['labels'], ['label_1', 'label_2'])
+        self.assertEqual(notes[2]['text'], 'note, "2"')
+        # Метки одним запросом, заметки серверным курсором
+        # и по одному запросу меток на каждую из трёх пачек заметок.
+        self.assertEqual(len(queries), 5)
+
+    def test_csv(self):
+        response, content, _ = self.export(HTTP_ACCEPT='text/csv')
+        self.assertIn('attachment; filename="notes.csv"',
+                      response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], ['id', 'created_at', 'text', 'labels'])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[3][2:], ['note, "2"', 'label_1|label_2'])
+
+        response = self.client.get(self.URL_EXPORT, {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+
+    def test_anonymous(self):
+        self.client.credentials()
+        response = self.client.get(self.URL_EXPORT)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestNotesImport(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_IMPORT = reverse('notes-import')
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        cls.label = Label.objects.create(owner=cls.user, title='Дивиденды')
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{AUTH_PREFIX} {response.data['access']}")
+
+    def labels_of(self, text):
+        return sorted(Note.objects.get(author=self.user, text=text)
+                      .labels.values_list('title', flat=True))
+
+    @override_settings(IMPORT_BATCH_SIZE=2)
+    def test_ndjson(self):
+        lines = [
+            {'type': 'label', 'title': 'empty'},
+            {'text': 'first', 'labels': ['дивиденды', 'SBER']},
+            {'type': 'note', 'text': 'second', 'labels': ['sber', 'Sber']},
+            {'text': '', 'labels': []},
+            {'text': 'third'},
+        ]
+        body = '\n'.join(json.dumps(line, ensure_ascii=False)
+                         for line in lines) + '\nnot json\n'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.URL_IMPORT, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['notes'], 3)
+        self.assertEqual(response.data['labels'], 2)
+        self.assertEqual([error['line'] for error in response.data['errors']],
+                         [4, 6])
+        self.assertEqual(self.labels_of('first'), ['SBER', 'Дивиденды'],
+                         'Метки сопоставляются с учётом регистра')
+        self.assertEqual(self.labels_of('second'), ['SBER'])
+        self.assertEqual(self.labels_of('third'), [])
+        self.assertTrue(Label.objects.filter(owner=self.user,
+                                             title='empty').exists())
+        self.assertLess(len(queries), 30,
+                        'Импорт выполняет запросы на каждую запись')
+
+    def test_csv_export_roundtrip(self):
+        created_at = datetime(2024, 3, 1, 12, 30, 15, 123456,
+                              tzinfo=dt_timezone.utc)
+        note = Note.objects.create(author=self.user, text='многострочная\n'
+                                                          'заметка, "SBER"',
+                                   created_at=created_at)
+        labels = [self.label, *Label.objects.bulk_create(
+            Label(owner=self.user, title=title)
+            for title in ('a|b', 'c\\d|'))]
+        note.labels.add(*labels)
+        content = b''.join(self.client.get(
+            reverse('notes-export'), HTTP_ACCEPT='text/csv'
+        ).streaming_content)
+        note.delete()
+        Label.objects.filter(pk__in=[label.pk for label in labels[1:]]
+                             ).delete()
+
+        upload = SimpleUploadedFile('notes.csv', content,
+                                    content_type='text/csv')
+        response = self.client.post(self.URL_IMPORT, {'file': upload})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['notes'], 1)
+        self.assertEqual(response.data['labels'], 2)
+        self.assertEqual(self.labels_of(note.text),
+                         ['a|b', 'c\\d|', 'Дивиденды'],
+                         'Названия меток с разделителем не сохранились')
+        self.assertEqual(
+            Note.objects.get(author=self.user, text=note.text).created_at,
+            created_at, 'Импорт не сохранил дату создания')
+
+    def test_created_at(self):
+        lines = [
+            {'text': 'dated', 'created_at': '2023-05-04T10:00:00+03:00'},
+            {'text': 'bad date', 'created_at': 'вчера'},
+        ]
+        result = import_notes(self.user, io.StringIO(
+            '\n'.join(json.dumps(line, ensure_ascii=False)
+                      for line in lines)))
+        self.assertEqual(result.notes, 1)
+        self.assertEqual([error['line'] for error in result.errors], [2])
+        self.assertEqual(
+            Note.objects.get(author=self.user, text='dated').created_at,
+            datetime(2023, 5, 4, 7, tzinfo=dt_timezone.utc))
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as file:
+            for i in range(5):
+                file.write(json.dumps({'text': f'note {i}',
+                                       'labels': ['cmd']}) + '\n')
+            file.flush()
+            out = io.StringIO()
+            call_command('import_notes', 'user', file.name,
+                         '--batch-size', '2', stdout=out)
+        self.assertEqual(out.getvalue().count('Заметок:'), 3,
+                         'Нет отчёта о ходе импорта')
+        self.assertEqual(Note.objects.filter(author=self.user,
+                                             labels__title='cmd').count(), 5)
+
+
+class TestDetailQueries(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        cls.other_user = User.objects.create_user(
+            username='other', password='testpwd123123',
+            email='other@test.com', is_active=True)
+        cls.label = Label.objects.create(owner=cls.user, title='label')
+        cls.note = Note.objects.create(author=cls.user, text='note')
+        cls.other_note = Note.objects.create(author=cls.other_user,
+                                             text='other')
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{AUTH_PREFIX} {response.data['access']}")
+        # Пользователь из токена попадает в кэш первым запросом.
+        self.client.get(reverse(USER_ME))
+
+    def test_label_detail(self):
+        url = reverse(LABEL_DETAIL, args=[self.label.pk])
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {'title': 'renamed'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Точки сохранения ставит транзакция теста, а не view.
+        self.assertEqual(
+            [query['sql'].split()[0] for query in queries
+             if 'SAVEPOINT' not in query['sql']],
+            ['SELECT', 'UPDATE'])
+
+    def test_note_detail(self):
+        url = reverse(NOTE_DETAIL, args=[self.note.pk])
+        # Заметка и её метки, без запроса автора.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(
+            reverse(NOTE_DETAIL, args=[self.other_note.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_object_permission(self):
+        permission = IsAuthor()
+        request = mock.Mock(user=self.user)
+        note = Note.objects.only('author').get(pk=self.other_note.pk)
+        view = mock.Mock(owner_field='author')
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                permission.has_object_permission(request, view, note),
+                'Чужая заметка доступна')
+            note.author_id = self.user.pk
+            self.assertTrue(
+                permission.has_object_permission(request, view, note))
+
+
+class TestValuesListEquivalence(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        labels = Label.objects.bulk_create(
+            Label(owner=cls.user, title=title)
+            for title in ('b', 'A', 'c', 'Дивиденды', 'Zeta', 'alpha'))
+        for i in range(6):
+            note = Note.objects.create(
+                author=cls.user, text=f'Заметка {i}: дивиденды SBER')
+            note.labels.set(labels[i % 4:])
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{AUTH_PREFIX} {response.data['access']}")
+
+    def get_results(self, name, params=None):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content)['results']
+
+    def serialize(self, serializer_class, queryset):
+        data = serializer_class(queryset, many=True).data
+        return json.loads(json.dumps(data))
+
+    def test_labels(self):
+        expected = self.serialize(
+            LabelSerializer, Label.objects.filter(owner=self.user))
+        self.assertEqual(self.get_results(LABEL_LIST), expected,
+                         'Быстрый список меток отличается от сериализатора')
+        self.assertEqual(
+            self.get_results(LABEL_LIST, {'search': 'b'}),
+            [label for label in expected if label['title'] == 'b'])
+
+    def test_notes(self):
+        queryset = (Note.objects.filter(author=self.user)
+                    .order_by('-created_at', '-id')
+                    .prefetch_related('labels'))
+        self.assertEqual(self.get_results(NOTE_LIST),
+                         self.serialize(NoteSerializer, queryset),
+                         'Быстрый список заметок отличается от сериализатора')
+
+        request = Request(APIRequestFactory().get(
+            '/', {'search': 'дивиденды'}))
+        searched = NoteSearchFilter().filter_queryset(
+            request, queryset, None).order_by('-rank', '-created_at', '-id')
+        results = self.get_results(NOTE_LIST, {'search': 'дивиденды'})
+        self.assertEqual(results, self.serialize(NoteSerializer, searched))
+        self.assertIn('<mark>', results[0]['headline'])
+
+    def test_notes_label_collation(self):
+        # В лингвистической сортировке регистр вторичен:
+        # 'alpha' < 'b' < 'Zeta', а по кодам символов 'Zeta' < 'alpha'.
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            for collation in ('unicode', 'en-x-icu', 'en_US.utf8',
+                              'ru_RU.utf8'):
+                try:
+                    with transaction.atomic():
+                        cursor.execute(
+                            'ALTER TABLE notes_label ALTER COLUMN title '
+                            f'TYPE varchar(64) COLLATE "{collation}"')
+                    break
+                except DatabaseError:
+                    continue
+            else:
+                self.skipTest('В базе нет лингвистической сортировки')
+        queryset = (Note.objects.filter(author=self.user)
+                    .order_by('-created_at', '-id')
+                    .prefetch_related('labels'))
+        results = self.get_results(NOTE_LIST)
+        self.assertEqual(
+            [label['title'] for label in results[-1]['labels']],
+            ['A', 'alpha', 'b', 'c', 'Zeta', 'Дивиденды'])
+        self.assertEqual(results, self.serialize(NoteSerializer, queryset),
+                         'Метки заметки упорядочены не как в базе')
+
+
+class TestFastJSON(APITestCase):
+
+    data = {
+        'results': [{
+            'id': 1,
+            'title': 'Дивиденды "SBER"\u2028',
+            'created_at': datetime(2025, 1, 2, 3, 4, 5, 678901,
+                                   tzinfo=dt_timezone.utc),
+            'amount': Decimal('1.50'),
+            'labels': ({'id': 2, 'title': 'A'},),
+        }],
+        'next': None,
+        3: 'ключ-число',
+    }
+
+    def render(self, renderer_class, **kwargs):
+        return renderer_class().render(self.data, 'application/json',
+                                       kwargs)
+
+    def test_renderer_matches_json_renderer(self):
+        self.assertIsNotNone(renderers.orjson, 'orjson не установлен')
+        content = self.render(FastJSONRenderer)
+        self.assertEqual(content, self.render(JSONRenderer),
+                         'Вывод отличается от JSONRenderer')
+        self.assertIn('Дивиденды'.encode(), content,
+                      'Кириллица должна выводиться без экранирования')
+        self.assertIn(b'\\u2028', content)
+
+    def test_renderer_indent_and_fallback(self):
+        self.assertEqual(self.render(FastJSONRenderer, indent=4),
+                         self.render(JSONRenderer, indent=4))
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(self.render(FastJSONRenderer),
+                             self.render(JSONRenderer))
+
+    def test_parser(self):
+        content = '{"title": "Метка", "ids": [1, 2]}'.encode()
+        for orjson in (parsers.orjson, None):
+            with mock.patch.object(parsers, 'orjson', orjson):
+                self.assertEqual(
+                    FastJSONParser().parse(io.BytesIO(content)),
+                    JSONParser().parse(io.BytesIO(content)))
+                with self.assertRaises(ParseError):
+                    FastJSONParser().parse(io.BytesIO(b'{"title": '))
+
+    def test_api(self):
+        User.objects.create_user(username='user', password='testpwd123123',
+                                 email='user@test.com', is_active=True)
+        response = self.client.post(
+            reverse(JWT_CREATE),
+            json.dumps({'username': 'user', 'password': 'testpwd123123'}),
+            content_type='application/json')
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{AUTH_PREFIX} {response.data['access']}")
+        response = self.client.post(
+            reverse(LABEL_LIST), json.dumps({'title': 'Дивиденды'}),
+            content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse(LABEL_LIST), b'{"title": ',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse(LABEL_LIST))
+        self.assertIn('"title":"Дивиденды"'.encode(), response.content)
+        response = self.client.get(reverse(LABEL_LIST),
+                                   HTTP_ACCEPT='text/html')
+        self.assertIn(b'&quot;title&quot;: ', response.content,
+                      'Browsable API должен выводить JSON с отступами')
+
+    def test_schema(self):
+        response = self.client.get(reverse(SCHEMA_JSON, args=['json']))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('/notes/', json.loads(response.content)['paths'])
+        response = self.client.get(reverse('schema-swagger-ui'),
+                                   {'format': 'openapi'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        json.loads(response.content)
+
+
+def zstd_decompress(data):
+    # Потоковый кадр zstd не содержит размер, decompress() его требует.
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class TestCompression(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_LABEL_LIST = reverse(LABEL_LIST)
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        cls.label = Label.objects.create(owner=cls.user, title='label')
+        Label.objects.bulk_create(
+            Label(owner=cls.user, title=f'Метка {i}') for i in range(20))
+        for i in range(20):
+            Note.objects.create(author=cls.user, text=f'Заметка {i}')
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.auth = f"{AUTH_PREFIX} {response.data['access']}"
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+
+    def test_gzip(self):
+        plain = self.client.get(self.URL_LABEL_LIST)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get(self.URL_LABEL_LIST,
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip',
+                         'Список меток не сжат')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']),
+                         len(response.content))
+
+    def test_brotli_and_zstd(self):
+        plain = self.client.get(self.URL_LABEL_LIST)
+        response = self.client.get(self.URL_LABEL_LIST,
+                                   HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+        response = self.client.get(self.URL_LABEL_LIST,
+                                   HTTP_ACCEPT_ENCODING='gzip, br, zstd')
+        self.assertEqual(response['Content-Encoding'], 'zstd',
+                         'При равном q выбирается порядок сервера')
+        self.assertEqual(zstd_decompress(response.content), plain.content)
+
+    def test_streaming_brotli_and_zstd(self):
+        url = reverse('notes-export')
+        plain = b''.join(self.client.get(url).streaming_content)
+        for encoding, decompress in (('br', brotli.decompress),
+                                     ('zstd', zstd_decompress)):
+            with self.subTest(encoding):
+                response = self.client.get(url,
+                                           HTTP_ACCEPT_ENCODING=encoding)
+                self.assertEqual(response['Content-Encoding'], encoding)
+                self.assertEqual(
+                    decompress(b''.join(response.streaming_content)), plain)
+
+    def test_not_compressed(self):
+        response = self.client.get(
+            reverse(LABEL_DETAIL, args=[self.label.pk]),
+            HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'),
+                         'Короткий ответ не нужно сжимать')
+        response = self.client.get(self.URL_LABEL_LIST,
+                                   HTTP_ACCEPT_ENCODING='gzip;q=0, deflate')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_weak_etag(self):
+        response = self.client.get(self.URL_LABEL_LIST,
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'),
+                        'ETag сжатого ответа должен быть слабым')
+        response = self.client.get(self.URL_LABEL_LIST,
+                                   HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_streaming(self):
+        url = reverse('notes-export')
+        plain = b''.join(self.client.get(url).streaming_content)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_schema(self):
+        response = self.client.get(reverse(SCHEMA_JSON, args=['json']),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        json.loads(gzip.decompress(response.content))
+
+    async def test_async(self):
+        self.assertTrue(iscoroutinefunction(
+            CompressionMiddleware(mock.AsyncMock())),
+            'Под ASGI middleware должен работать без sync_to_async')
+        headers = {'Authorization': self.auth}
+        url = reverse('async-labels-list')
+        plain = await self.async_client.get(url, headers=headers)
+        response = await self.async_client.get(
+            url, headers={**headers, 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    @override_settings(COMPRESSION=False)
+    def test_disabled(self):
+        client = self.client_class()
+        client.credentials(HTTP_AUTHORIZATION=self.auth)
+        response = client.get(self.URL_LABEL_LIST,
+                              HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_choose_codec(self):
+        codecs = [mock.Mock(encoding='zstd'), GzipCodec(6)]
+        self.assertEqual(choose_codec(codecs, 'gzip, zstd').encoding, 'zstd',
+                         'При равном q выбирается порядок сервера')
+        self.assertEqual(
+            choose_codec(codecs, 'zstd;q=0.5, gzip').encoding, 'gzip')
+        self.assertEqual(choose_codec(codecs, '*').encoding, 'zstd')
+        self.assertIsNone(choose_codec(codecs, 'identity, zstd;q=0'))
+        self.assertIsNone(choose_codec(codecs, ''))
+
+
+class TestSettingsProfile(APITestCase):
+
+    BOOT = """
+import json, sys
+from invest_notes.wsgi import application
+from django.conf import settings
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    'apps': settings.INSTALLED_APPS,
+    'urls': [str(pattern.pattern) for pattern in get_resolver().url_patterns],
+    'modules': [name for name in ('drf_yasg.views', 'django_extensions')
+                if name in sys.modules],
+}))
+"""
+
+    def boot(self, profile, cache_url='file:///var/tmp/django_cache',
+             check=True):
+        process = subprocess.run(
+            [sys.executable, '-c', self.BOOT], cwd=settings.BASE_DIR,
+            env={**os.environ, 'SETTINGS_PROFILE': profile,
+                 'CACHE_URL': cache_url,
+                 'DJANGO_SETTINGS_MODULE': 'invest_notes.settings'},
+            check=check, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True)
+        return json.loads(process.stdout) if check else process
+
+    def test_development(self):
+        result = self.boot('development')
+        self.assertIn('drf_yasg', result['apps'])
+        self.assertIn('admin/', result['urls'])
+        self.assertEqual(result['modules'], ['django_extensions'],
+                         'Представления схемы должны строиться лениво')
+
+    def test_production(self):
+        result = self.boot('production')
+        for app in ('django.contrib.admin', 'drf_yasg', 'django_extensions'):
+            self.assertNotIn(app, result['apps'],
+                             f'{app} не нужен в production-профиле')
+        self.assertEqual(result['urls'], ['api/'])
+        self.assertEqual(result['modules'], [])
+
+    def test_production_requires_shared_cache(self):
+        process = self.boot('production', cache_url='locmem://', check=False)
+        self.assertNotEqual(process.returncode, 0)
+        self.assertIn('ImproperlyConfigured', process.stderr,
+                      'production-профиль запустился с locmem-кэшем')
+        self.boot('development', cache_url='locmem://')
+
+
+class TestLabelNoteCount(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.URL_LABEL_LIST = reverse(LABEL_LIST)
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        cls.labels = Label.objects.bulk_create(
+            Label(owner=cls.user, title=title) for title in 'abcde')
+
+    def setUp(self):
+        response = self.client.post(reverse(JWT_CREATE), {
+            'username': 'user', 'password': 'testpwd123123'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"{AUTH_PREFIX} {response.data['access']}")
+
+    def counts(self):
+        return dict(Label.objects.filter(owner=self.user)
+                    .values_list('title', 'note_count'))
+
+    def create_note(self, *labels):
+        response = self.client.post(
+            reverse(NOTE_LIST), {'text': 'note', 'labels': [
+                label.pk for label in labels]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def test_counts_follow_changes(self):
+        a, b, c, d, e = self.labels
+        first = self.create_note(a, b)
+        self.create_note(a)
+        self.assertEqual(self.counts(), {'a': 2, 'b': 1, 'c': 0, 'd': 0,
+                                         'e': 0})
+
+        self.client.patch(reverse(NOTE_DETAIL, args=[first]),
+                          {'labels': [b.pk, c.pk]}, format='json')
+        self.assertEqual(self.counts(), {'a': 1, 'b': 1, 'c': 1, 'd': 0,
+                                         'e': 0})
+
+        self.client.delete(reverse(NOTE_DETAIL, args=[first]))
+        self.assertEqual(self.counts(), {'a': 1, 'b': 0, 'c': 0, 'd': 0,
+                                         'e': 0})
+
+        import_notes(self.user, io.StringIO(
+            '{"type": "note", "text": "x", "labels": ["a", "d"]}\n'))
+        self.assertEqual(self.counts(), {'a': 2, 'b': 0, 'c': 0, 'd': 1,
+                                         'e': 0})
+
+        self.client.delete(reverse(LABEL_DETAIL, args=[a.pk]))
+        self.assertEqual(self.counts(), {'b': 0, 'c': 0, 'd': 1, 'e': 0})
+
+    def test_save_keeps_count(self):
+        stale = Label.objects.get(pk=self.labels[0].pk)
+        self.create_note(self.labels[0])
+        stale.title = 'renamed'
+        stale.save()
+        self.assertEqual(self.counts()['renamed'], 1,
+                         'save() метки затёр note_count')
+        Label.objects.filter(pk=stale.pk).update(note_count=100)
+        self.assertEqual(self.counts()['renamed'], 1)
+
+    def test_list_ordering_and_filter(self):
+        a, b, c, d, e = self.labels
+        self.create_note(a, b, c)
+        self.create_note(b, c)
+        self.create_note(c)
+        response = self.client.get(self.URL_LABEL_LIST)
+        self.assertEqual(response.data['results'][0],
+                         {'id': a.pk, 'title': 'a', 'note_count': 1},
+                         'Список меток не содержит note_count')
+
+        titles = []
+        url, params = self.URL_LABEL_LIST, {'ordering': '-note_count',
+                                            'page_size': 2}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles += [label['title'] for label in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(titles, ['c', 'b', 'a', 'e', 'd'],
+                         'Неверный порядок меток по числу заметок')
+
+        response = self.client.get(self.URL_LABEL_LIST, {
+            'ordering': 'note_count', 'min_notes': 1, 'max_notes': 2})
+        self.assertEqual([label['title']
+                          for label in response.data['results']], ['a', 'b'])
+        response = self.client.get(self.URL_LABEL_LIST, {'max_notes': 0})
+        self.assertEqual([label['title']
+                          for label in response.data['results']], ['d', 'e'])
+
+        for params in ({'ordering': 'text'}, {'min_notes': '-1'},
+                       {'max_notes': 'x'}):
+            response = self.client.get(self.URL_LABEL_LIST, params)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST, params)
+
+    def test_pages_with_tied_counts(self):
+        Label.objects.bulk_create(
+            Label(owner=self.user, title=f'tied {i}') for i in range(7))
+        self.create_note(self.labels[2])
+        expected = list(Label.objects.filter(owner=self.user).order_by(
+            '-note_count', '-id').values_list('id', flat=True))
+        ids = []
+        url, params = self.URL_LABEL_LIST, {'ordering': '-note_count',
+                                            'page_size': 3}
+        # Одинаковых note_count больше, чем offset_cutoff: курсор
+        # со смещением здесь зацикливался.
+        with mock.patch.object(LabelPagination, 'offset_cutoff', 2):
+            while url and len(ids) < 30:
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                ids += [label['id'] for label in response.data['results']]
+                url, params = response.data['next'], None
+            previous = self.client.get(response.data['previous'])
+        self.assertEqual(ids, expected,
+                         'Курсор теряет или повторяет метки с равным числом '
+                         'заметок')
+        self.assertEqual([label['id'] for label in previous.data['results']],
+                         expected[6:9])
+
+    def test_cached_list_invalidated(self):
+        self.client.get(self.URL_LABEL_LIST)
+        self.create_note(self.labels[0])
+        response = self.client.get(self.URL_LABEL_LIST)
+        self.assertEqual(response.data['results'][0]['note_count'], 1,
+                         'Закэшированный список не учёл новую заметку')
+
+    def test_recount_command(self):
+        self.create_note(self.labels[0], self.labels[1])
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL notes.recount_note_count = 'on'")
+            cursor.execute('UPDATE notes_label SET note_count = 7 '
+                           'WHERE id = %s', [self.labels[0].pk])
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('recount_label_notes', '--verify', stdout=out)
+        self.assertIn(f'Метка {self.labels[0].pk}: note_count 7',
+                      out.getvalue())
+
+        call_command('recount_label_notes', '--batch-size', '2',
+                     stdout=out)
+        self.assertIn('Исправлено меток: 1', out.getvalue())
+        self.assertEqual(self.counts()['a'], 1)
+        call_command('recount_label_notes', '--verify', stdout=out)
+
+
+class TestBulkDelete(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+
+        cls.user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        cls.other_user = User.objects.create_user(
+            username='other', password='testpwd123123',
+            email='other@test.com', is_active=True)
+        labels = Label.objects.bulk_create(
+            Label(owner=cls.user, title=title) for title in 'abc')
+        for i in range(10):
+            note = Note.objects.create(author=cls.user, text=f'note {i}')
+            note.labels.set(labels)
+        Note.objects.create(author=cls.other_user, text='other')
+
+    def test_user_delete_skips_rows(self):
+        self.assertFalse(any(signal.has_listeners(model)
+                             for signal in (pre_delete, post_delete)
+                             for model in (Note, Label)),
+                         'Получатели удаления отключают быстрое удаление')
+        with mock.patch('notes.models.bump_data_version') as bump, \
+                mock.patch('notes.signals.bump_data_version') as user_bump, \
+                CaptureQueriesContext(connection) as queries:
+            user_id = self.user.pk
+            self.user.delete()
+        bump.assert_not_called()
+        user_bump.assert_called_once_with(user_id, LABELS, NOTES)
+        self.assertFalse(
+            [query['sql'] for query in queries
+             if '"notes_note"."text"' in query['sql']],
+            'Удаляемые заметки загружаются целиком')
+        self.assertEqual(Note.objects.count(), 1)
+
+    def test_queryset_delete_bumps_once_per_owner(self):
+        before = get_data_version(self.user.pk, LABELS)
+        with mock.patch('notes.models.bump_data_version',
+                        wraps=bump_data_version) as bump:
+            Note.objects.filter(text__startswith='note').delete()
+            Label.objects.all().delete()
+        self.assertEqual(bump.call_args_list,
+                         [mock.call(self.user.pk, LABELS, NOTES)] * 2)
+        self.assertNotEqual(get_data_version(self.user.pk, LABELS), before)
+
+
+class TestLabelNoteCountConcurrency(APITransactionTestCase):
+
+    def test_parallel_writes(self):
+        user = User.objects.create_user(
+            username='user', password='testpwd123123',
+            email='user@test.com', is_active=True)
+        labels = Label.objects.bulk_create(
+            Label(owner=user, title=title) for title in 'abc')
+        barrier = threading.Barrier(6)
+        errors = []
+
+        def write(index):
+            try:
+                barrier.wait()
+                for _ in range(5):
+                    with transaction.atomic():
+                        note = Note.objects.create(author=user, text='x')
+                        # Метки в разном порядке: триггер блокирует их
+                        # по id, поэтому взаимоблокировок нет.
+                        note.labels.set(labels[::1 if index % 2 else -1])
+                        note.labels.remove(labels[index % 3])
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=write, args=[index])
+                   for index in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        for label in labels:
+            label.refresh_from_db()
+            self.assertEqual(label.note_count, label.notes.count(),
+                             f'note_count метки {label.title} разошёлся')
+        call_command('recount_label_notes', '--verify', stdout=io.StringIO())
@@ -0,0 +1,80 @@
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+
+def incr_counter(cache, key, timeout):
+    """
+    Увеличивает счётчик окна и возвращает новое значение. add() создаёт
+    ключ со сроком жизни timeout, incr() увеличивает существующий.
+    Ключ создаётся первым запросом окна и живёт не меньше самого окна.
+    В Redis add() — SET NX, а incr() — INCR, обе операции атомарны;
+    в locmem они выполняются под блокировкой. В кэшах file:// и db://
+    incr() — это get и set, и параллельные запросы могут потерять
+    приращения: такие кэши годятся для лимитов только в разработке.
+    """
+    if cache.add(key, 1, timeout):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout)
+        return 1
+
+
+async def aincr_counter(cache, key, timeout):
+    """Асинхронный incr_counter через aadd() и aincr() кэша."""
+    if await cache.aadd(key, 1, timeout):
+        return 1
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, timeout)
+        return 1
+
+
+class FixedWindowThrottleMixin:
+    """
+    Лимит по фиксированному окну: в кэше хранится одно число на окно
+    вместо списка меток времени каждого запроса, как в SimpleRateThrottle.
+    """
+
+    def allow_request(self, request, view):
+        key = self.get_window_key(request, view)
+        if key is None:
+            return True
+        count = incr_counter(self.cache, key, self.duration)
+        if count > self.num_requests:
+            return self.throttle_failure()
+        return True
+
+    async def aallow_request(self, request, view):
+        """allow_request для асинхронных views без потока sync_to_async."""
+        key = self.get_window_key(request, view)
+        if key is None:
+            return True
+        count = await aincr_counter(self.cache, key, self.duration)
+        if count > self.num_requests:
+            return self.throttle_failure()
+        return True
+
+    def get_window_key(self, request, view):
+        """Ключ счётчика текущего окна, None — запрос не ограничивается."""
+        if self.rate is None:
+            return None
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return None
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.window_end = (window + 1) * self.duration
+        return f'{self.key}:{window}'
+
+    def wait(self):
+        return self.window_end - self.now
+
+
+class UserFixedWindowThrottle(FixedWindowThrottleMixin, UserRateThrottle):
+    pass
+
+
+class AnonFixedWindowThrottle(FixedWindowThrottleMixin, AnonRateThrottle):
+    pass
@@ -0,0 +1,76 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Замеры одного запроса: SQL, аутентификация, сериализация."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = Counter()
+        self.queries = Counter()
+        self.sql_time = 0.0
+        self._active = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper: время и текст каждого SQL-запроса."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries[sql] += 1
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def duplicates(self, threshold):
+        """Одинаковые запросы, выполненные не меньше threshold раз (N+1)."""
+        return {sql: count for sql, count in self.queries.items()
+                if count >= threshold}
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+
+def activate():
+    timing = RequestTiming()
+    return timing, _current.set(timing)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """
+    Добавляет время блока к метрике name текущего запроса. Вложенные
+    блоки с тем же именем не учитываются повторно. Без активного
+    замера (middleware выключен) блок выполняется как есть.
+    """
+    timing = _current.get()
+    if timing is None or name in timing._active:
+        yield
+        return
+    timing._active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.durations[name] += time.perf_counter() - started
+        timing._active.discard(name)
+
+
+class TimedDataMixin:
+    """Время построения serializer.data попадает в метрику serialize."""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
@@ -1,27 +1,56 @@
+from functools import cache
+
+from django.conf import settings
 from django.urls import path, re_path, include
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import permissions
 from rest_framework.routers import DefaultRouter
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from .views import LabelViewSet, UserViewSet
-
-
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Snippets API",
-      default_version='v1',
-      description="Invest Notes Discription",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="morozov460336@yandex.ru"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
+from . import async_views
+from .views import LabelViewSet, NoteViewSet, UserViewSet
+
+
+@cache
+def get_schema_views():
+    """
+    Представления drf_yasg строятся при первом обращении к схеме,
+    а не при импорте URLconf: воркеру, которому схема не нужна,
+    не приходится импортировать drf_yasg и обходить API.
+    """
+    from drf_yasg.views import get_schema_view
+    from .schema import API_INFO
+
+    schema_view = get_schema_view(
+       API_INFO,
+       public=True,
+       permission_classes=(permissions.AllowAny,),
+    )
+    return {
+        'spec': schema_view.without_ui(
+            cache_timeout=settings.API_SCHEMA_CACHE_TIMEOUT),
+        'swagger': schema_view.with_ui('swagger', cache_timeout=0),
+        'redoc': schema_view.with_ui('redoc', cache_timeout=0),
+    }
+
+
+def lazy_schema_view(name):
+    @csrf_exempt
+    def view(request, *args, **kwargs):
+        return get_schema_views()[name](request, *args, **kwargs)
+    return view
+
+
+def schema_json_view(request, format):
+    """JSON-схема из статического файла при API_SCHEMA_STATIC."""
+    if settings.API_SCHEMA_STATIC and format == 'json':
+        from .schema import static_schema_view
+        return static_schema_view(request)
+    return get_schema_views()['spec'](request, format=format)
+
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 router.register(r'labels', LabelViewSet, basename='labels')
+router.register(r'notes', NoteViewSet, basename='notes')
 
 urlpatterns = [
 #     path('users/', UserViewSet.as_view({'post': 'create'})),
@@ -29,15 +58,20 @@ urlpatterns = [
 #     path('users/activation/', UserViewSet.as_view({'post': 'activation'})),
 
     re_path('', include('djoser.urls.jwt')),
+    path('async/labels/', async_views.label_list,
+         name='async-labels-list'),
+    path('async/labels/<int:pk>/', async_views.label_detail,
+         name='async-labels-detail'),
     path('', include(router.urls)),
-
-    path('swagger<format>/',
-         schema_view.without_ui(cache_timeout=0),
-         name='schema-json'),
-    path('swagger/',
-         schema_view.with_ui('swagger', cache_timeout=0),
-         name='schema-swagger-ui'),
-    path('redoc/',
-         schema_view.with_ui('redoc', cache_timeout=0),
-         name='schema-redoc'),
 ]
+
+if settings.ENABLE_API_DOCS:
+    urlpatterns += [
+        re_path(r'^swagger\.(?P<format>json|yaml)$',
+                schema_json_view,
+                name='schema-json'),
+        path('swagger/', lazy_schema_view('swagger'),
+             name='schema-swagger-ui'),
+        path('redoc/', lazy_schema_view('redoc'),
+             name='schema-redoc'),
+    ]
@@ -0,0 +1,40 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Области версий: labels меняется вместе с метками пользователя,
+# notes — с заметками и метками, которые заметки показывают.
+LABELS = 'labels'
+NOTES = 'notes'
+
+
+def data_version_key(user_id, scope):
+    return f'data:version:{scope}:{user_id}'
+
+
+def get_data_version(user_id, scope):
+    """
+    Версия данных пользователя: время последнего изменения
+    в наносекундах. Если ключа в кэше нет, версия начинается заново
+    с текущего времени и не совпадает ни с одной из выданных ранее.
+    """
+    key = data_version_key(user_id, scope)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_data_version(user_id, *scopes):
+    """Меняет версии сейчас и ещё раз после коммита текущей транзакции."""
+    keys = [data_version_key(user_id, scope) for scope in scopes]
+
+    def bump():
+        version = time.time_ns()
+        cache.set_many(dict.fromkeys(keys, version), None)
+
+    bump()
+    transaction.on_commit(bump)
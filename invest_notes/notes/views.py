@@ -1,8 +1,30 @@
-from rest_framework import viewsets, mixins, filters
+import hashlib
+
+from dataclasses import asdict
+
+from rest_framework import status, viewsets, mixins
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
-from .models import Label
-from .serializers import LabelSerializer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from .models import Label, Note
+from .serializers import (LabelBulkItemSerializer, LabelSerializer,
+                          NoteSerializer, represent_labels, represent_notes)
+from .pagination import LabelPagination, NotePagination
+from .filters import (LabelIdsFilter, LabelUsageFilter, NoteSearchFilter,
+                      TrigramSearchFilter)
 from .permissions import IsAuthor
+from .export import export_csv, export_ndjson
+from .importer import detect_format, import_notes, read_lines
+from .renderers import CSVRenderer, NDJSONRenderer
+from .versions import LABELS, NOTES, get_data_version
 from djoser import views
 
 
@@ -10,13 +32,103 @@ class UserViewSet(views.UserViewSet):
     http_method_names = ['get', 'post', 'patch']
 
 
-class LabelViewSet(viewsets.GenericViewSet, mixins.DestroyModelMixin,
+def url_hash(url):
+    return hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+
+
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для list и retrieve по версии данных
+    пользователя (version_scope) из кэша. Если клиент прислал
+    актуальный If-None-Match или If-Modified-Since, ответ 304
+    отдаётся без запросов к БД и без сериализации.
+    """
+    version_scope = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def conditional(self, handler, request, *args, **kwargs):
+        version = get_data_version(request.user.id, self.version_scope)
+        etag = quote_etag(f'{request.user.id}-{version}-'
+                          f'{url_hash(request.get_full_path())[:8]}')
+        last_modified = version // 10 ** 9
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class CachedListMixin:
+    """
+    Готовый ответ list лежит в общем кэше под ключом из владельца,
+    версии его данных и полного URL. Любая запись меняет версию,
+    поэтому старые ключи просто перестают читаться. Поиск не кэшируется.
+    """
+    list_cache_timeout = 0
+
+    def list(self, request, *args, **kwargs):
+        if (not self.list_cache_timeout
+                or request.query_params.get(api_settings.SEARCH_PARAM)):
+            return super().list(request, *args, **kwargs)
+
+        version = get_data_version(request.user.id, self.version_scope)
+        key = (f'list:{self.basename}:{request.user.id}:{version}:'
+               f'{url_hash(request.build_absolute_uri())}')
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        cache.set(key, response.data, self.list_cache_timeout)
+        return response
+
+
+class ValuesListMixin:
+    """
+    Список читается через values(list_fields) и выводится функцией
+    represent_rows(rows, owner_id), минуя модели и сериализатор; запись
+    и валидация по-прежнему идут через serializer_class. Аннотации
+    фильтров (rank, headline) попадают в строки вместе с полями.
+    """
+    list_fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not callable(getattr(cls, 'represent_rows', None)):
+            raise TypeError(f'{cls.__name__} должен задать represent_rows')
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(*self.list_fields,
+                               *queryset.query.annotations)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.represent_rows(list(rows), request.user.id))
+        return self.get_paginated_response(
+            self.represent_rows(page, request.user.id))
+
+
+class LabelViewSet(ConditionalGetMixin, CachedListMixin, ValuesListMixin,
+                   viewsets.GenericViewSet, mixins.DestroyModelMixin,
                    mixins.CreateModelMixin, mixins.ListModelMixin,
                    mixins.UpdateModelMixin, mixins.RetrieveModelMixin):
     queryset = Label.objects.all()
     serializer_class = LabelSerializer
+    version_scope = LABELS
+    list_cache_timeout = settings.LABEL_LIST_CACHE_TIMEOUT
+    list_fields = ('id', 'title', 'note_count')
+    represent_rows = staticmethod(represent_labels)
     http_method_names = ['post', 'get', 'delete', 'patch']
-    filter_backends = [filters.SearchFilter]
+    pagination_class = LabelPagination
+    filter_backends = [LabelUsageFilter, TrigramSearchFilter]
     search_fields = ['title',]
 
     def get_permissions(self):
@@ -24,8 +136,100 @@ class LabelViewSet(viewsets.GenericViewSet, mixins.DestroyModelMixin,
             return [IsAuthenticated(), ]
         return [IsAuthor(), ]
 
+    def get_serializer_class(self):
+        if self.action == 'bulk':
+            return LabelBulkItemSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         return Label.objects.filter(owner__id=self.request.user.id)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Пакетная операция над метками: {"title"} создаёт метку,
+        {"id", "title"} переименовывает, {"id", "delete": true} удаляет.
+        """
+        serializer = self.get_serializer(
+            data=request.data, many=True,
+            max_length=settings.API_MAX_BULK_SIZE)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+
+class NoteViewSet(ConditionalGetMixin, ValuesListMixin,
+                  viewsets.ModelViewSet):
+    serializer_class = NoteSerializer
+    version_scope = NOTES
+    filter_backends = [NoteSearchFilter, LabelIdsFilter]
+    http_method_names = ['post', 'get', 'delete', 'patch']
+    pagination_class = NotePagination
+    owner_field = 'author'
+    list_fields = ('id', 'text', 'created_at', 'label_ids')
+    represent_rows = staticmethod(represent_notes)
+
+    def get_permissions(self):
+        if self.action == 'create':
+            return [IsAuthenticated(), ]
+        return [IsAuthor(), ]
+
+    def get_queryset(self):
+        return (Note.objects.filter(author__id=self.request.user.id)
+                .only('text', 'created_at', 'author')
+                .prefetch_related(Prefetch(
+                    'labels', queryset=Label.objects.only('title'))))
+
+    def perform_create(self, serializer):
+        serializer.save(author=self.request.user)
+
+    @action(detail=False, methods=['get'],
+            renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """
+        Все метки и заметки автора потоком: NDJSON по умолчанию,
+        CSV по ?format=csv или Accept: text/csv.
+        """
+        chunk_size = settings.EXPORT_CHUNK_SIZE
+        notes = self.get_queryset().order_by('created_at', 'id')
+        renderer = request.accepted_renderer
+        if renderer.format == 'csv':
+            content = export_csv(notes, chunk_size)
+        else:
+            labels = Label.objects.filter(owner__id=request.user.id)
+            content = export_ndjson(labels.only('title').order_by('id'),
+                                    notes, chunk_size)
+        response = StreamingHttpResponse(
+            content, content_type=f'{renderer.media_type}; '
+                                  f'charset={renderer.charset}')
+        response['Content-Disposition'] = (
+            f'attachment; filename="notes.{renderer.format}"')
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import',
+            url_name='import', parser_classes=[MultiPartParser])
+    def import_notes(self, request):
+        """
+        Импорт заметок в формате экспорта. Тело запроса — NDJSON
+        или CSV (Content-Type: text/csv), либо multipart с полем file.
+        Файл читается построчно и записывается пачками.
+        """
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'file': ['No file was submitted.']},
+                                status=status.HTTP_400_BAD_REQUEST)
+            stream = upload
+            format = detect_format(upload.content_type or '', upload.name)
+        else:
+            stream = request.stream
+            format = detect_format(request.content_type)
+        if stream is None:
+            return Response({'detail': 'Empty request body.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        result = import_notes(request.user, read_lines(stream), format,
+                              settings.IMPORT_BATCH_SIZE)
+        return Response(asdict(result), status=status.HTTP_201_CREATED)